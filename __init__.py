@@ -44,9 +44,9 @@ try:
 except FileExistsError:
     pass
 sys.path.append(depdir)
-try:
-    import svglib, svgpathtools
-except ImportError:
+# only look the packages up: importing them is slow and sticker tiles are usually read from a compiled library
+from importlib.util import find_spec
+if find_spec('svglib') is None or find_spec('svgpathtools') is None:
     import subprocess
     print("Installing dependencies to", depdir)
     subprocess.check_call([bpy.app.binary_path_python, '-m', 'pip', 'install', '--target', depdir, 'svglib', 'svgpathtools'])
@@ -0,0 +1,128 @@
+from collections import defaultdict
+from itertools import chain
+from math import floor
+
+# Shapes are described by plain tuples (x, y), so that this module does not depend on Blender.
+
+
+class Shape:
+    """Outline of a face or a sticker, for collision tests
+    segments: list of point pairs
+    polygon: closed outline for containment tests, or None
+    points: points that must not lie inside other shapes
+    base: points that other shapes may touch, such as the ends of the edge a sticker is attached to"""
+    __slots__ = ('segments', 'polygon', 'points', 'base', 'box')
+
+    def __init__(self, segments, polygon=None, points=(), base=()):
+        self.segments = segments
+        self.polygon = polygon
+        self.points = [point for point in points if point not in base]
+        self.base = set(base)
+        coords = list(chain.from_iterable(self.segments)) + self.points
+        if coords:
+            xs, ys = [p[0] for p in coords], [p[1] for p in coords]
+            self.box = min(xs), min(ys), max(xs), max(ys)
+        else:
+            self.box = None
+
+
+def outline(points):
+    """Segments between consecutive points, where None separates contours"""
+    return [(a, b) for a, b in zip(points, points[1:]) if a is not None and b is not None]
+
+
+def orientation(a, b, c):
+    value = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    # ignore sign noise of points that are (almost) collinear
+    scale = abs(b[0] - a[0]) + abs(b[1] - a[1]) + abs(c[0] - a[0]) + abs(c[1] - a[1])
+    return 0 if abs(value) <= 1e-9 * scale * scale else value
+
+
+def segments_cross(a, b, c, d):
+    """Check if the segments ab and cd cross each other; touching is not crossing"""
+    return (orientation(c, d, a) * orientation(c, d, b) < 0 and
+            orientation(a, b, c) * orientation(a, b, d) < 0)
+
+
+def is_inside(point, polygon):
+    """Even-odd test of a point against a closed polygon"""
+    x, y = point
+    inside = False
+    for (ax, ay), (bx, by) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+            inside = not inside
+    return inside
+
+
+def boxes_overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def shapes_collide(a, b):
+    if not boxes_overlap(a.box, b.box):
+        return False
+    if b.polygon and any(is_inside(point, b.polygon) for point in a.points if point not in b.base):
+        return True
+    if a.polygon and any(is_inside(point, a.polygon) for point in b.points if point not in a.base):
+        return True
+    return any(segments_cross(p, q, r, s) for p, q in a.segments for r, s in b.segments
+               if boxes_overlap(segment_box(p, q), segment_box(r, s)))
+
+
+def segment_box(p, q):
+    # slightly inflated, so that collinear touching segments still get compared
+    return min(p[0], q[0]) - 1e-12, min(p[1], q[1]) - 1e-12, max(p[0], q[0]) + 1e-12, max(p[1], q[1]) + 1e-12
+
+
+class GridIndex:
+    """Uniform grid of shape bounding boxes, finds overlap candidates in near-linear time"""
+    __slots__ = ('cell', 'cells')
+
+    def __init__(self, cell):
+        self.cell = cell
+        self.cells = defaultdict(list)
+
+    def keys(self, box):
+        x0, y0, x1, y1 = (floor(value / self.cell) for value in box)
+        return ((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+
+    def insert(self, index, box):
+        for key in self.keys(box):
+            self.cells[key].append(index)
+
+    def remove(self, index, box):
+        for key in self.keys(box):
+            self.cells[key].remove(index)
+
+    def candidates(self, box):
+        return {index for key in self.keys(box) for index in self.cells.get(key, ())}
+
+
+def colliding(shapes, checked, ignored):
+    """Find which of the checked shapes collide with any other shape
+    shapes: list of Shape
+    checked: indices of shapes to be tested, typically the stickers
+    ignored: for each checked index, a set of indices it may touch freely
+    returns a set of indices from checked"""
+    boxes = [shape.box for shape in shapes]
+    sizes = sorted(max(box[2] - box[0], box[3] - box[1]) for box in boxes if box)
+    if not sizes:
+        return set()
+    # cells about as large as a typical shape keep both the cell count and the candidate lists short
+    index = GridIndex(max(sizes[len(sizes) // 2], 1e-9))
+    for i, box in enumerate(boxes):
+        if box:
+            index.insert(i, box)
+    checked = set(checked)
+    result = set()
+    for i in checked:
+        if not boxes[i]:
+            continue
+        for j in index.candidates(boxes[i]):
+            if j == i or j in ignored.get(i, ()) or (j in checked and j < i):
+                continue
+            if shapes_collide(shapes[i], shapes[j]):
+                result.add(i)
+                if j in checked:
+                    result.add(j)
+    return result
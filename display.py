@@ -0,0 +1,631 @@
+import mathutils as M
+import numpy as np
+
+if __package__ is None or __package__ == '':
+    # uses current directory visibility
+    import stickers
+    import packing
+    import collision
+    import strokefont
+else:
+    # uses current package visibility
+    from . import stickers
+    from . import packing
+    from . import collision
+    from . import strokefont
+
+# Everything in a display list is in page coordinates: meters from the bottom left corner of the page, y upwards.
+# Exporters only scale, flip and serialize it.
+
+# path codes, the same as in matplotlib.path.Path
+MOVETO, LINETO, CURVE4, CLOSEPOLY = 1, 2, 4, 79
+# height of capitals relative to the font size of labels, as in Helvetica
+CAP_HEIGHT = 0.72
+
+
+class Paths:
+    """Several subpaths as parallel arrays
+    points: float array of shape (n, 2)
+    codes: uint8 array of shape (n,); CURVE4 marks both control points and the end point of a cubic curve,
+    the point of a CLOSEPOLY repeats the start of its subpath"""
+    __slots__ = ('points', 'codes')
+
+    def __init__(self, points, codes):
+        self.points = np.array(points, dtype=float).reshape(-1, 2)
+        self.codes = np.array(codes, dtype=np.uint8)
+
+    def __bool__(self):
+        return len(self.codes) > 0
+
+    def __add__(self, other):
+        return Paths(np.concatenate((self.points, other.points)), np.concatenate((self.codes, other.codes)))
+
+
+class PathBuilder:
+    """Collects subpaths into flat lists, then converts them to Paths at once"""
+    __slots__ = ('points', 'codes')
+
+    def __init__(self):
+        self.points = list()
+        self.codes = list()
+
+    def add_vertices(self, vertices, offset, close=False):
+        """Add UVVertices as polylines, where (0.5, 0.5) separates contours and pairs of UVHandles make curves
+        close: close the last contour"""
+        start = None
+        new_contour = True
+        curve = 0  # remaining points of the current curve
+        for vertex in vertices:
+            if vertex.co.x == 0.5:
+                new_contour = True
+                continue
+            if new_contour:
+                code, curve, start = MOVETO, 0, len(self.points)
+                new_contour = False
+            elif curve or isinstance(vertex, stickers.UVHandle):
+                # a curve is two control points followed by its end point
+                code, curve = CURVE4, (curve or 3) - 1
+            else:
+                code = LINETO
+            self.points.append((vertex.co.x + offset[0], vertex.co.y + offset[1]))
+            self.codes.append(code)
+        if close and start is not None:
+            self.points.append(self.points[start])
+            self.codes.append(CLOSEPOLY)
+
+    def add_segment(self, a, b, offset):
+        self.points.extend(((a.x + offset[0], a.y + offset[1]), (b.x + offset[0], b.y + offset[1])))
+        self.codes.extend((MOVETO, LINETO))
+
+    def build(self):
+        return Paths(self.points, self.codes)
+
+
+class Texts:
+    """Labels centered at their positions
+    positions: float array of shape (n, 2)
+    matrices: float array of shape (n, 2, 2), rotation of each label
+    sizes: float array of shape (n,), font size in meters"""
+    __slots__ = ('labels', 'positions', 'matrices', 'sizes')
+
+    def __init__(self, items):
+        self.labels = [label for label, position, matrix, size in items]
+        self.positions = np.array([position for label, position, matrix, size in items], dtype=float).reshape(-1, 2)
+        self.matrices = np.array([matrix for label, position, matrix, size in items], dtype=float).reshape(-1, 2, 2)
+        self.sizes = np.array([size for label, position, matrix, size in items], dtype=float)
+
+    def __bool__(self):
+        return bool(self.labels)
+
+    def __iter__(self):
+        return zip(self.labels, self.positions, self.matrices, self.sizes)
+
+
+class Image:
+    """Raster image given by a file path or by data prepared by the exporter's encode_image
+    pos: bottom left corner"""
+    __slots__ = ('pos', 'size', 'path', 'data')
+
+    def __init__(self, pos, size, path=None, data=None):
+        self.pos = np.array(pos, dtype=float)
+        self.size = np.array(size, dtype=float)
+        self.path = path
+        self.data = data
+
+
+class IslandDrawing:
+    """Everything to be drawn of one island
+    lettering: labels drawn as single strokes, if they are not left as texts"""
+    __slots__ = ('outer', 'convex', 'concave', 'freestyle', 'sticker_fill', 'texts', 'lettering', 'image')
+
+
+class PageDrawing:
+    """Display list of one page"""
+    __slots__ = ('name', 'image', 'islands')
+
+
+def draw_page(page, page_size, margin, angle_epsilon=0, text_size=0.012, optimize=False, common_lines=False,
+              stroke_text=False):
+    """Build the display list of a page in a single pass over its islands
+    optimize: order the paths for short travel of a cutter starting in the top left corner
+    common_lines: draw straight outlines shared by touching islands only once
+    stroke_text: draw labels as single-stroke lettering instead of font text"""
+    drawing = PageDrawing()
+    drawing.name = page.name
+    drawing.image = Image((margin, margin), (page_size[0] - 2 * margin, page_size[1] - 2 * margin),
+                          path=page.image_path) if page.image_path else None
+    drawing.islands = [draw_island(island, margin, angle_epsilon, text_size) for island in page.islands]
+    if stroke_text:
+        for island in drawing.islands:
+            island.lettering = stroke_texts(island.texts)
+            island.texts = Texts(())
+    if common_lines:
+        remove_common_lines(drawing)
+    if optimize:
+        optimize_order(drawing, (0, page_size[1]))
+    return drawing
+
+
+def draw_island(island, margin, angle_epsilon=0, text_size=0.012):
+    offset = island.pos.x + margin, island.pos.y + margin
+    identity = ((1, 0), (0, 1))
+    drawing = IslandDrawing()
+    drawing.image = None
+    if island.image_path or island.embedded_image:
+        drawing.image = Image(offset, island.bounding_box, path=island.image_path, data=island.embedded_image)
+
+    texts = list()
+    if island.title:
+        position = offset[0] + 0.5 * island.bounding_box.x, offset[1] + 0.2 * text_size
+        texts.append((island.title, position, identity, text_size))
+    fill = PathBuilder()
+    for marker in island.markers:
+        if isinstance(marker, (stickers.Sticker, stickers.PourHole)):
+            fill.add_vertices(marker.vertices, offset, close=True)
+            size = marker.width
+        else:
+            size = marker.size
+        if marker.text:
+            position = marker.center.x + offset[0], marker.center.y + offset[1]
+            texts.append((marker.text, position, marker.rot, size))
+
+    outer = PathBuilder()
+    outer_edges = set(island.boundary)
+    while outer_edges:
+        loop = list()
+        uvedge = outer_edges.pop()
+        while 1:
+            if uvedge.sticker:
+                loop.extend(uvedge.sticker.vertices[1:])
+            elif uvedge.pourhole:
+                loop.extend(uvedge.pourhole.vertices[1:])
+            else:
+                loop.append(uvedge.vb if uvedge.uvface.flipped else uvedge.va)
+            uvedge = uvedge.neighbor_right
+            try:
+                outer_edges.remove(uvedge)
+            except KeyError:
+                break
+        outer.add_vertices(loop, offset, close=True)
+
+    convex, concave, freestyle = PathBuilder(), PathBuilder(), PathBuilder()
+    for loop, uvedge in island.edges.items():
+        edge = island.mesh.edges[loop.edge]
+        if edge.is_cut(uvedge.uvface.face) and not (uvedge.sticker or uvedge.pourhole):
+            continue
+        if edge.freestyle:
+            freestyle.add_segment(uvedge.va.co, uvedge.vb.co, offset)
+        # pins and teeth replace the fold along their edge
+        if uvedge.sticker and uvedge.type not in ('glue', 'auto'):
+            continue
+        # each uvedge is in two opposite-oriented variants, join_segments draws them once
+        target = convex if edge.angle > angle_epsilon else concave
+        target.add_segment(uvedge.va.co, uvedge.vb.co, offset)
+    if island.is_inside_out:
+        convex, concave = concave, convex
+
+    drawing.outer = outer.build()
+    drawing.convex = join_segments(convex.build())
+    drawing.concave = join_segments(concave.build())
+    drawing.freestyle = join_segments(freestyle.build())
+    drawing.sticker_fill = fill.build()
+    drawing.texts = Texts(texts)
+    drawing.lettering = Paths((), ())
+    return drawing
+
+
+def stroke_texts(texts):
+    """Single-stroke lettering of labels, centered at their positions with the baseline there, as font text is"""
+    points, codes = list(), list()
+    for label, position, matrix, size in texts:
+        scale = CAP_HEIGHT * size
+        pen = -0.5 * strokefont.text_width(label)
+        for character in label:
+            strokes, advance = strokefont.glyph(character)
+            for stroke in strokes:
+                points.append(position + ((stroke + (pen, 0)) * scale) @ matrix.T)
+                codes.append(np.r_[MOVETO, np.full(len(stroke) - 1, LINETO)])
+            pen += advance
+    if not points:
+        return Paths((), ())
+    return Paths(np.concatenate(points), np.concatenate(codes))
+
+
+def join_segments(paths):
+    """Chain segments with common end points into polylines, so that a plotter lifts its head less often.
+    Each segment is drawn once even if it was added twice, and points inside straight runs are left out.
+    paths: subpaths of two points each, as added by PathBuilder.add_segment"""
+    if not paths:
+        return paths
+    nodes, inverse = np.unique(paths.points, axis=0, return_inverse=True)
+    pairs = np.unique(np.sort(inverse.reshape(-1, 2), axis=1), axis=0)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]].tolist()
+    adjacency = [list() for node in nodes]
+    for index, (a, b) in enumerate(pairs):
+        adjacency[a].append(index)
+        adjacency[b].append(index)
+    used = [False] * len(pairs)
+
+    def walk(node):
+        chain = [node]
+        edges = adjacency[node]
+        while edges:
+            index = edges.pop()
+            if used[index]:
+                continue
+            used[index] = True
+            a, b = pairs[index]
+            node = b if a == node else a
+            chain.append(node)
+            edges = adjacency[node]
+        return chain
+
+    # polylines can only end where an odd number of segments meet; what remains are closed loops
+    degrees = np.bincount(np.array(pairs).ravel(), minlength=len(nodes))
+    starts = np.r_[np.flatnonzero(degrees % 2), np.flatnonzero(degrees % 2 == 0)].tolist()
+    points, codes = list(), list()
+    for start in starts:
+        while any(not used[index] for index in adjacency[start]):
+            indices = walk(start)
+            closed = len(indices) > 3 and indices[0] == indices[-1]
+            chain = nodes[indices]
+            before, after = chain[1:-1] - chain[:-2], chain[2:] - chain[1:-1]
+            straight = (before[:, 0] * after[:, 1] == before[:, 1] * after[:, 0]) & ((before * after).sum(axis=1) > 0)
+            chain = chain[np.r_[True, ~straight, True]]
+            points.append(chain)
+            codes.append([MOVETO] + [LINETO] * (len(chain) - 2) + [CLOSEPOLY if closed else LINETO])
+    return Paths(np.concatenate(points), np.concatenate(codes))
+
+
+def simplify(paths, tolerance):
+    """Remove points of straight runs that are closer than the tolerance to the simplified line (Douglas-Peucker).
+    Subpath starts, curves and their end points are kept."""
+    codes = paths.codes
+    keep = codes != LINETO
+    # a run of line points is simplified together with the point before it, which always stays
+    runs = np.flatnonzero(np.diff(np.r_[0, codes == LINETO, 0]))
+    for start, end in zip(runs[::2] - 1, runs[1::2] - 1):
+        keep[end] = True
+        stack = [(start, end)]
+        while stack:
+            first, last = stack.pop()
+            if last - first < 2:
+                continue
+            a, b = paths.points[first], paths.points[last]
+            direction = b - a
+            length = np.hypot(*direction)
+            middle = paths.points[first + 1:last] - a
+            if length > 0:
+                distances = np.abs(middle[:, 0] * direction[1] - middle[:, 1] * direction[0]) / length
+            else:
+                distances = np.hypot(middle[:, 0], middle[:, 1])
+            farthest = int(np.argmax(distances))
+            if distances[farthest] > tolerance:
+                split = first + 1 + farthest
+                keep[split] = True
+                stack.extend(((first, split), (split, last)))
+    return Paths(paths.points[keep], codes[keep])
+
+
+def flatten(paths, steps=8):
+    """Replace each cubic curve by the given number of straight lines, for formats that know no curves"""
+    codes = paths.codes
+    curve = codes == CURVE4
+    if not curve.any():
+        return paths
+    index = np.arange(len(codes))
+    run_starts = np.maximum.accumulate(np.where(curve & ~np.r_[False, curve[:-1]], index, 0))
+    ends = np.flatnonzero(curve & ((index - run_starts) % 3 == 2))
+    p0, p1, p2, p3 = (paths.points[ends - back] for back in (3, 2, 1, 0))
+    t = np.linspace(0, 1, steps + 1)[1:, np.newaxis, np.newaxis]
+    s = 1 - t
+    samples = s * s * s * p0 + 3 * s * s * t * p1 + 3 * s * t * t * p2 + t * t * t * p3
+    # control points vanish, the end point of each curve expands into its samples
+    counts = np.where(curve, 0, 1)
+    counts[ends] = steps
+    offsets = np.cumsum(counts) - counts
+    points = np.empty((counts.sum(), 2))
+    new_codes = np.full(len(points), LINETO, dtype=np.uint8)
+    points[offsets[~curve]] = paths.points[~curve]
+    new_codes[offsets[~curve]] = codes[~curve]
+    points[offsets[ends, np.newaxis] + np.arange(steps)] = samples.transpose(1, 0, 2)
+    return Paths(points, new_codes)
+
+
+def split_paths(paths):
+    """List of (points, codes) of each subpath"""
+    starts = np.flatnonzero(paths.codes == MOVETO)[1:]
+    return list(zip(np.split(paths.points, starts), np.split(paths.codes, starts)))
+
+
+def merge_paths(subpaths):
+    if not subpaths:
+        return Paths((), ())
+    return Paths(np.concatenate([points for points, codes in subpaths]),
+                 np.concatenate([codes for points, codes in subpaths]))
+
+
+def reverse_subpath(points, codes):
+    """The same open subpath drawn from its end; each code moves to the other end of its segment"""
+    return points[::-1], np.r_[np.uint8(MOVETO), codes[:0:-1]]
+
+
+def subtract_intervals(start, end, intervals):
+    """Parts of the interval [start, end] not covered by any of the given intervals"""
+    result = list()
+    for low, high in sorted(intervals):
+        if low > start:
+            result.append((start, min(low, end)))
+        start = max(start, high)
+        if start >= end:
+            return result
+    result.append((start, end))
+    return result
+
+
+def trim_subpath(points, codes, removed):
+    """Redraw a subpath without the given parts of its straight segments
+    removed: {index of the point where a segment ends: list of (t0, t1) parameter intervals to leave out}
+    returns a list of (points, codes) of the open pieces that remain"""
+    out_points, out_codes = list(), list()
+    pen = None
+    index = 1
+    while index < len(codes):
+        start = points[index - 1]
+        if codes[index] == CURVE4:
+            pieces = [(start, points[index:index + 3], [CURVE4] * 3)]
+            index += 3
+        else:
+            end = points[index]
+            pieces = [(start + t0 * (end - start), [start + t1 * (end - start)], [LINETO])
+                      for t0, t1 in subtract_intervals(0, 1, removed.get(index, ())) if t1 - t0 > 1e-9]
+            index += 1
+        for first, rest, rest_codes in pieces:
+            if pen is None or not np.allclose(pen, first, rtol=0, atol=1e-12):
+                out_points.append(first)
+                out_codes.append(MOVETO)
+            out_points.extend(rest)
+            out_codes.extend(rest_codes)
+            pen = rest[-1]
+    if not out_codes:
+        return list()
+    subpaths = split_paths(Paths(out_points, out_codes))
+    # a closed outline that lost a part in its middle continues over its original start
+    if len(subpaths) > 1 and np.allclose(subpaths[-1][0][-1], subpaths[0][0][0], rtol=0, atol=1e-12):
+        (first_points, first_codes), (last_points, last_codes) = subpaths[0], subpaths[-1]
+        subpaths[-1] = np.concatenate((last_points, first_points[1:])), np.concatenate((last_codes, first_codes[1:]))
+        del subpaths[0]
+    return subpaths
+
+
+def remove_common_lines(drawing, tolerance=1e-6):
+    """Where a straight part of an outline runs along the outline of an island drawn earlier, leave it out,
+    so that a cutter traces each common line of two touching islands once"""
+    outlines = [split_paths(island.outer) if island.outer else list() for island in drawing.islands]
+    owners, starts, ends = list(), list(), list()
+    for island_index, subpaths in enumerate(outlines):
+        for subpath_index, (points, codes) in enumerate(subpaths):
+            curve = codes == CURVE4
+            # straight segments end at LINETO and CLOSEPOLY points, never at any point of a curve
+            for index in np.flatnonzero(~curve[1:]) + 1:
+                owners.append((island_index, subpath_index, int(index)))
+                starts.append(points[index - 1])
+                ends.append(points[index])
+    if not owners:
+        return
+    starts, ends = np.array(starts), np.array(ends)
+    boxes = np.c_[np.minimum(starts, ends) - tolerance, np.maximum(starts, ends) + tolerance]
+    lengths = np.hypot(*(ends - starts).T)
+    sizes = np.sort(np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]))
+    grid = collision.GridIndex(max(sizes[len(sizes) // 2], 1e-9))
+    for index, box in enumerate(boxes.tolist()):
+        grid.insert(index, box)
+    removed = dict()
+    for index, box in enumerate(boxes.tolist()):
+        if lengths[index] <= tolerance:
+            continue
+        direction = (ends[index] - starts[index]) / lengths[index]
+        normal = direction[1], -direction[0]
+        for other in grid.candidates(box):
+            # each common line is kept in the island drawn first
+            if owners[other][0] >= owners[index][0] or lengths[other] <= tolerance:
+                continue
+            ends_other = np.array((starts[other], ends[other])) - starts[index]
+            if np.abs(ends_other @ normal).max() > tolerance:
+                continue
+            t0, t1 = sorted(ends_other @ direction / lengths[index])
+            low, high = max(t0, 0), min(t1, 1)
+            if (high - low) * lengths[index] > tolerance:
+                removed.setdefault(owners[index][:2], dict()).setdefault(owners[index][2], list()).append((low, high))
+    for island_index, (island, subpaths) in enumerate(zip(drawing.islands, outlines)):
+        if any(key[0] == island_index for key in removed):
+            pieces = list()
+            for subpath_index, (points, codes) in enumerate(subpaths):
+                cuts = removed.get((island_index, subpath_index))
+                pieces.extend(trim_subpath(points, codes, cuts) if cuts else [(points, codes)])
+            island.outer = merge_paths(pieces)
+
+
+def nearest_neighbor_tour(starts, ends, reversible, position):
+    """Visit all paths, always continuing with the closest free end point
+    starts, ends: arrays of shape (n, 2); reversible: which paths may be entered at their end
+    returns a list of (path index, is reversed)"""
+    count = len(starts)
+    points = np.concatenate((starts, ends[reversible]))
+    owners = np.r_[np.arange(count), np.flatnonzero(reversible)]
+    extent = max(float(np.ptp(points, axis=0).max()), 1e-9)
+    cell = extent / max(1, count ** 0.5)
+    grid = collision.GridIndex(cell)
+    boxes = [(x, y, x, y) for x, y in points.tolist()]
+    for index, box in enumerate(boxes):
+        grid.insert(index, box)
+    owned = [list() for i in range(count)]
+    for index, owner in enumerate(owners.tolist()):
+        owned[owner].append(index)
+    low, high = points.min(axis=0), points.max(axis=0)
+    tour = list()
+    for step in range(count):
+        x, y = position
+        # start with a box that reaches the points, and never look at cells outside of them
+        radius = max(cell, float(np.hypot(*np.maximum(0, np.maximum(low - position, position - high)))))
+        while True:
+            box = (max(x - radius, low[0]), max(y - radius, low[1]), min(x + radius, high[0]), min(y + radius, high[1]))
+            found = np.array(sorted(grid.candidates(box)))
+            if len(found):
+                distances = np.hypot(*(points[found] - position).T)
+                best = int(np.argmin(distances))
+                if distances[best] <= radius:
+                    break
+                # a box of this radius contains every point that could be closer
+                radius = float(distances[best])
+            else:
+                radius *= 2
+        index = int(found[best])
+        owner = int(owners[index])
+        for other in owned[owner]:
+            grid.remove(other, boxes[other])
+        is_reversed = index >= count
+        tour.append((owner, is_reversed))
+        position = starts[owner] if is_reversed else ends[owner]
+    return tour
+
+
+def two_opt(starts, ends, position, window=64, passes=4):
+    """Shorten the travel between paths by reversing parts of the tour, together with the direction of each path
+    starts, ends: arrays in tour order, changed in place
+    returns the new order and which paths got reversed, both relative to the given tour"""
+    count = len(starts)
+    order = np.arange(count)
+    flipped = np.zeros(count, dtype=bool)
+    for attempt in range(passes):
+        improved = False
+        for i in range(count):
+            before = position if i == 0 else ends[i - 1]
+            j = np.arange(i, min(count, i + window))
+            has_after = j + 1 < count
+            after = starts[np.minimum(j + 1, count - 1)]
+            old = np.hypot(*(before - starts[i])) + has_after * np.hypot(*(ends[j] - after).T)
+            new = np.hypot(*(before - ends[j]).T) + has_after * np.hypot(*(starts[i] - after).T)
+            best = int(np.argmax(old - new))
+            if old[best] - new[best] > 1e-12:
+                k = j[best] + 1
+                starts[i:k], ends[i:k] = ends[i:k][::-1].copy(), starts[i:k][::-1].copy()
+                order[i:k] = order[i:k][::-1]
+                flipped[i:k] = ~flipped[i:k][::-1]
+                improved = True
+        if not improved:
+            break
+    return order, flipped
+
+
+def order_subpaths(subpaths, position, ranks=None):
+    """Order subpaths (points, codes) for short travel of the tool, subpaths of a lower rank first
+    returns the reordered subpaths and the position where the tool ends"""
+    if ranks is None:
+        ranks = [0] * len(subpaths)
+    result = list()
+    for rank in sorted(set(ranks)):
+        group = [subpath for subpath, subpath_rank in zip(subpaths, ranks) if subpath_rank == rank]
+        starts = np.array([points[0] for points, codes in group])
+        ends = np.array([points[-1] for points, codes in group])
+        # the point of a CLOSEPOLY repeats the start, so closed subpaths begin and end at the same place
+        reversible = np.array([codes[-1] != CLOSEPOLY for points, codes in group])
+        tour = nearest_neighbor_tour(starts, ends, reversible, position)
+        indices = [index for index, is_reversed in tour]
+        reversed_ = np.array([is_reversed for index, is_reversed in tour], dtype=bool)
+        tour_starts = np.where(reversed_[:, np.newaxis], ends[indices], starts[indices])
+        tour_ends = np.where(reversed_[:, np.newaxis], starts[indices], ends[indices])
+        order, flipped = two_opt(tour_starts, tour_ends, np.array(position, dtype=float))
+        for k, flip in zip(order.tolist(), flipped.tolist()):
+            points, codes = group[indices[k]]
+            if reversed_[k] != flip and codes[-1] != CLOSEPOLY:
+                points, codes = reverse_subpath(points, codes)
+            result.append((points, codes))
+        position = result[-1][0][-1]
+    return result, position
+
+
+def containment_ranks(subpaths):
+    """For each subpath, minus the number of others whose bounding box encloses its own; holes get lower ranks"""
+    boxes = np.array([np.r_[points.min(axis=0), points.max(axis=0)] for points, codes in subpaths])
+    inside = ((boxes[:, np.newaxis, :2] >= boxes[np.newaxis, :, :2]).all(axis=2) &
+              (boxes[:, np.newaxis, 2:] <= boxes[np.newaxis, :, 2:]).all(axis=2))
+    np.fill_diagonal(inside, False)
+    return (-inside.sum(axis=1)).tolist()
+
+
+def optimize_order(drawing, position):
+    """Reorder the islands of a page and the paths within them, so that the tool travels little between cuts.
+    Within an island, lettering and score lines stay before the cut outline,
+    and holes are cut before what encloses them."""
+    islands = [island for island in drawing.islands if island.outer]
+    if not islands:
+        return
+    centers = np.array([(island.outer.points.min(axis=0) + island.outer.points.max(axis=0)) / 2
+                        for island in islands])
+    tour = nearest_neighbor_tour(centers, centers, np.zeros(len(islands), dtype=bool), position)
+    drawing.islands = [islands[index] for index, is_reversed in tour] + [
+        island for island in drawing.islands if not island.outer]
+    for island in drawing.islands:
+        for name in ('lettering', 'freestyle', 'convex', 'concave', 'outer'):
+            paths = getattr(island, name)
+            if not paths:
+                continue
+            subpaths = split_paths(paths)
+            ranks = containment_ranks(subpaths) if name == 'outer' else None
+            subpaths, position = order_subpaths(subpaths, position, ranks)
+            setattr(island, name, merge_paths(subpaths))
+
+
+# Layers of machine-ready output: identifier, label, and the classes of island elements each of them holds.
+# Backgrounds and tab fills are only decoration and belong to no layer.
+LAYERS = (
+    ('CUT', "Cut", ('outer',)),
+    ('SCORE', "Score", ('freestyle', 'convex', 'concave')),
+    ('ENGRAVE', "Engrave", ('lettering', 'text')),
+)
+
+
+def layer_order(positions):
+    """Layers sorted by their positions, given as {identifier: number}; layers of equal position keep their order"""
+    return tuple(sorted(LAYERS, key=lambda layer: positions[layer[0]]))
+
+
+class Style:
+    """Plain copy of the export style, so that exporters can be rebuilt in worker processes"""
+    __slots__ = (
+        'line_width', 'sticker_fill', 'text_color', 'use_inbg', 'use_outbg',
+        'outer_color', 'outer_style', 'outer_width', 'outbg_color', 'outbg_width',
+        'convex_color', 'convex_style', 'convex_width', 'concave_color', 'concave_style', 'concave_width',
+        'freestyle_color', 'freestyle_style', 'freestyle_width', 'inbg_color', 'inbg_width')
+
+    def __init__(self, style):
+        for name in self.__slots__:
+            value = getattr(style, name)
+            setattr(self, name, tuple(value) if name.endswith(("_color", "_fill")) else value)
+
+
+def exporter_payload(exporter):
+    """Everything needed to rebuild the exporter, as plain values"""
+    attributes = dict(vars(exporter))
+    return type(exporter), tuple(attributes.pop("page_size")), attributes
+
+
+def render_page(payload):
+    """Worker process entry: rebuild the exporter and call one of its methods"""
+    (Exporter, page_size, attributes), method, args = payload
+    exporter = Exporter.__new__(Exporter)
+    vars(exporter).update(attributes)
+    exporter.page_size = M.Vector(page_size)
+    return getattr(exporter, method)(*args)
+
+
+def render_pages(exporter, method, jobs, parallel=False):
+    """Call the named method of the exporter with each tuple of arguments, in worker processes if asked for
+    returns the results in order"""
+    pool = packing.process_pool() if parallel and len(jobs) > 1 else None
+    if pool is None:
+        return [getattr(exporter, method)(*args) for args in jobs]
+    payload = exporter_payload(exporter)
+    with pool:
+        return list(pool.map(render_page, [(payload, method, args) for args in jobs]))
@@ -0,0 +1,112 @@
+import mathutils as M
+from math import atan2, degrees
+
+if __package__ is None or __package__ == '':
+    # uses current directory visibility
+    import display
+else:
+    # uses current package visibility
+    from . import display
+
+
+class DXF:
+    """Simple DXF exporter, lines and text only"""
+
+    # classes of island elements in the order of drawing; each of them gets a layer unless machine layers are used
+    line_classes = ("freestyle", "convex", "concave", "outer", "lettering", "text")
+    # AutoCAD color index of each layer
+    layer_colors = {
+        "outer": 1, "convex": 5, "concave": 3, "freestyle": 6, "lettering": 7, "text": 7,
+        "Cut": 1, "Score": 5, "Engrave": 7, "0": 7}
+    buffer_size = 1 << 16
+
+    def __init__(self, page_size: M.Vector, style, margin, pure_net=True, angle_epsilon=0):
+        self.page_size = page_size
+        self.style = display.Style(style)
+        self.margin = margin
+        self.pure_net = pure_net
+        self.angle_epsilon = angle_epsilon
+        self.optimize_order = False  # sort paths for short travel of a cutter
+        self.common_lines = False  # cut lines shared by touching islands once
+        self.parallel = False  # render pages in worker processes
+        self.stroke_text = False  # draw labels as single-stroke lettering instead of font text
+        self.layers = ()  # machine layers in the order of output, see display.LAYERS; empty to use line classes
+        self.curve_steps = 8  # straight lines per Bezier curve, polylines know no cubic curves
+
+    @classmethod
+    def encode_image(cls, bpy_image):
+        """DXF carries no raster images, so textures are left out"""
+        return None
+
+    def polyline_entities(self, paths, layer):
+        """Generate a POLYLINE with its VERTEX entities for each subpath of the given display.Paths"""
+        vertex_tag = self.vertex_tag.format(layer=layer)
+        for points, codes in display.split_paths(display.flatten(paths, self.curve_steps)):
+            closed = codes[-1] == display.CLOSEPOLY
+            if closed:
+                points = points[:-1]
+            yield self.polyline_tag.format(layer=layer, flags=int(closed))
+            yield vertex_tag * len(points) % tuple((1000 * points).ravel().tolist())
+            yield self.sequence_end_tag.format(layer=layer)
+
+    def text_entities(self, texts, layer):
+        for label, position, matrix, size in texts:
+            yield self.text_tag.format(
+                layer=layer, label=label, pos=1000 * position, height=1000 * display.CAP_HEIGHT * size,
+                angle=degrees(atan2(matrix[1][0], matrix[0][0])))
+
+    def page_entities(self, drawing):
+        """Generate the entities of a display.PageDrawing as strings, grouped by machine layers or by islands"""
+        def entities(island, name, layer):
+            if name == "text":
+                return self.text_entities(island.texts, layer) if island.texts else ()
+            paths = getattr(island, name)
+            return self.polyline_entities(paths, layer) if paths else ()
+
+        if self.layers:
+            for identifier, label, classes in self.layers:
+                for island in drawing.islands:
+                    for name in classes:
+                        yield from entities(island, name, label)
+        else:
+            for island in drawing.islands:
+                for name in self.line_classes:
+                    yield from entities(island, name, name)
+
+    def write_page(self, drawing, filename):
+        """Stream a display.PageDrawing into a file, entity by entity"""
+        layers = ["0"] + ([label for identifier, label, classes in self.layers] or list(self.line_classes))
+        with open(filename, 'w', buffering=self.buffer_size) as f:
+            f.write(self.header_base.format(width=1000 * self.page_size[0], height=1000 * self.page_size[1]))
+            f.write(self.tables_base.format(count=len(layers), layers="".join(
+                self.layer_tag.format(name=name, color=self.layer_colors[name]) for name in layers)))
+            f.write("0\nSECTION\n2\nENTITIES\n")
+            f.writelines(self.page_entities(drawing))
+            f.write("0\nENDSEC\n0\nEOF\n")
+
+    def write(self, mesh, filename):
+        """Write data to a file given by its name, one file per page"""
+        jobs = list()
+        for page in mesh.pages:
+            page_filename = "{}_{}.dxf".format(filename[:filename.rfind(".dxf")], page.name) if len(
+                mesh.pages) > 1 else filename
+            drawing = display.draw_page(
+                page, self.page_size, self.margin, self.angle_epsilon, self.text_size, self.optimize_order,
+                self.common_lines, self.stroke_text)
+            jobs.append((drawing, page_filename))
+        display.render_pages(self, "write_page", jobs, self.parallel)
+
+    # DXF R12 needs no handles, subclass markers or object sections, so the file can be streamed as it is drawn
+    polyline_tag = "0\nPOLYLINE\n8\n{layer}\n66\n1\n10\n0.0\n20\n0.0\n30\n0.0\n70\n{flags}\n"
+    vertex_tag = "0\nVERTEX\n8\n{layer}\n10\n%.6f\n20\n%.6f\n"
+    sequence_end_tag = "0\nSEQEND\n8\n{layer}\n"
+    text_tag = "0\nTEXT\n8\n{layer}\n10\n{pos[0]:.6f}\n20\n{pos[1]:.6f}\n40\n{height:.6f}\n1\n{label}\n" \
+               "50\n{angle:.6f}\n72\n1\n11\n{pos[0]:.6f}\n21\n{pos[1]:.6f}\n"
+    layer_tag = "0\nLAYER\n2\n{name}\n70\n0\n62\n{color}\n6\nCONTINUOUS\n"
+
+    # drawing units are millimeters by convention, R12 has no header variable for them; the extents are the page
+    header_base = "0\nSECTION\n2\nHEADER\n9\n$ACADVER\n1\nAC1009\n9\n$HANDLING\n70\n0\n" \
+                  "9\n$EXTMIN\n10\n0.0\n20\n0.0\n9\n$EXTMAX\n10\n{width:.6f}\n20\n{height:.6f}\n0\nENDSEC\n"
+    tables_base = "0\nSECTION\n2\nTABLES\n" \
+                  "0\nTABLE\n2\nLTYPE\n70\n1\n0\nLTYPE\n2\nCONTINUOUS\n70\n0\n3\nSolid line\n72\n65\n73\n0\n40\n0.0\n" \
+                  "0\nENDTAB\n0\nTABLE\n2\nLAYER\n70\n{count}\n{layers}0\nENDTAB\n0\nENDSEC\n"
@@ -96,33 +96,77 @@ def unfold_all(objects, properties):
             error.mesh_select()
             # bpy.ops.object.mode_set(mode=recall_mode)
             return {'CANCELLED'}
-        mesh = object.data
-        mesh.update()
-        if mesh.paper_island_list:
-            unfolder.copy_island_names(mesh.paper_island_list)
-        island_list = mesh.paper_island_list
-        attributes = {item.label: (item.abbreviation, item.auto_label, item.auto_abbrev) for item in island_list}
-        island_list.clear()  # remove previously defined islands
-        for island in unfolder.mesh.islands:
-            # add islands to UI list and set default descriptions
-            list_item = island_list.add()
-            # add faces' IDs to the island
-            for face in island.faces:
-                lface = list_item.faces.add()
-                lface.id = face.index
-            list_item["label"] = island.label
-            list_item["abbreviation"], list_item["auto_label"], list_item["auto_abbrev"] = attributes.get(
-                island.label,
-                (island.abbreviation, True, True))
-            # island_item_changed(list_item, bpy.context)
-            mesh.paper_island_index = -1
-
+        update_island_list(unfolder, object.data)
 
         # bpy.ops.object.mode_set(mode=recall_mode)
         unfolder.save(properties, obj.name)
         del unfolder
     # storage.properties.do_create_stickers = True
 
+def update_island_list(unfolder, mesh):
+    """Replace the island list of the mesh in the UI by the islands of the unfolder, keeping their names"""
+    mesh.update()
+    if mesh.paper_island_list:
+        unfolder.copy_island_names(mesh.paper_island_list)
+    island_list = mesh.paper_island_list
+    attributes = {item.label: (item.abbreviation, item.auto_label, item.auto_abbrev) for item in island_list}
+    island_list.clear()  # remove previously defined islands
+    for island in unfolder.mesh.islands:
+        # add islands to UI list and set default descriptions
+        list_item = island_list.add()
+        # add faces' IDs to the island
+        for face in island.faces:
+            lface = list_item.faces.add()
+            lface.id = face.index
+        list_item["label"] = island.label
+        list_item["abbreviation"], list_item["auto_label"], list_item["auto_abbrev"] = attributes.get(
+            island.label,
+            (island.abbreviation, True, True))
+        # island_item_changed(list_item, bpy.context)
+        mesh.paper_island_index = -1
+
+
+def unfold_all_shared(objects, properties):
+    """Unfold all slices and pack their islands together onto sheets of the cutting material"""
+    sce = bpy.context.scene
+    settings = sce.paper_model
+    material = sce.slicer_settings
+    # material dimensions are given in millimeters
+    sheet_size = M.Vector((material.laser_slicer_material_width, material.laser_slicer_material_height)) / 1000
+    # ribs are split to fit the sheets they will be packed onto, not the paper page
+    printable_size = sheet_size - 2 * properties.output_margin * M.Vector((1, 1))
+    directions = {"Slice-x": 'x', "Slice-y": 'y', "Slice-z": 'z'}
+    objects = [obj for obj in objects if obj.name[:7] in directions]
+    if not objects:
+        return
+
+    # keep all slices in edit mode together, their bmesh data must stay valid until the document is written
+    bpy.ops.object.mode_set(mode='OBJECT')
+    bpy.ops.object.select_all(action='DESELECT')
+    for obj in objects:
+        obj.select_set(True)
+    bpy.context.view_layer.objects.active = objects[0]
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    scale = sce.unit_settings.scale_length / settings.scale
+    unfolders = list()
+    try:
+        for obj in objects:
+            unfolder = unfold.Unfolder(obj, s)
+            unfolder.do_create_uvmap = storage.do_create_uvmap
+            unfolder.prepare_ribs(
+                directions[obj.name[:7]], printable_size, storage.priority_effect, scale, settings.limit_by_page)
+            unfolder.mesh.mark_cuts()
+            update_island_list(unfolder, obj.data)
+            unfolders.append(unfolder)
+    except unfold.UnfoldError as error:
+        error.mesh_select()
+        return {'CANCELLED'}
+
+    unfold.UnfolderGroup(unfolders).save(properties, sheet_size, "-slices")
+    del unfolders
+
+
 class Unfold(bpy.types.Operator):
     """Blender Operator: unfold the selected object."""
 
@@ -327,7 +371,7 @@ def page_size_preset_changed(self, context):
         self.output_size_y = 0.356
 
 def menu_func_export(self, context):
-    self.layout.operator("export_mesh.paper_model", text="Paper Model (.pdf/.svg)")
+    self.layout.operator("export_mesh.paper_model", text="Paper Model (.pdf/.svg/.dxf/.gcode/.hpgl)")
 
 
 def menu_func_unfold(self, context):
@@ -807,9 +851,40 @@ class ExportPaperModel(bpy.types.Operator):
     sticker_width: bpy.props.FloatProperty(
         name="Tabs and Text Size", description="Width of gluing tabs and their numbers",
         default=0.005, soft_min=0, soft_max=0.05, step=0.1, subtype="UNSIGNED", unit="LENGTH")
+    do_parallel_stickers: bpy.props.BoolProperty(
+        name="Parallel Tabs", description="Build the tabs of each island in a separate process (faster on big molds)",
+        default=False)
+    do_keep_curves: bpy.props.BoolProperty(
+        name="Curved Tabs", description="Write curved parts of tabs as Bezier curves instead of many short lines",
+        default=False)
+    do_stroke_text: bpy.props.BoolProperty(
+        name="Single-Stroke Text", description="Draw titles and numbers as single lines for fast engraving, "
+                                               "instead of font text; G-code and HPGL always do",
+        default=False)
     angle_epsilon: bpy.props.FloatProperty(
         name="Hidden Edge Angle", description="Folds with angle below this limit will not be drawn",
         default=pi / 360, min=0, soft_max=pi / 4, step=0.01, subtype="ANGLE", unit="ROTATION")
+    do_optimize_order: bpy.props.BoolProperty(
+        name="Optimize Cut Order", description="Order lines on each page for short travel of a laser or plotter head",
+        default=False)
+    do_common_lines: bpy.props.BoolProperty(
+        name="Common Line Cutting", description="Cut straight outlines shared by touching islands only once",
+        default=False)
+    do_layered_output: bpy.props.BoolProperty(
+        name="Machine Layers", description="Group lines into cut, score and engrave layers instead of by islands",
+        default=False)
+    cut_layer_position: bpy.props.IntProperty(
+        name="Cut", description="Position of the through-cut layer (outlines and tabs) in the output",
+        default=3, min=1, max=3)
+    score_layer_position: bpy.props.IntProperty(
+        name="Score", description="Position of the score layer (folds) in the output",
+        default=2, min=1, max=3)
+    engrave_layer_position: bpy.props.IntProperty(
+        name="Engrave", description="Position of the engrave layer (text) in the output",
+        default=1, min=1, max=3)
+    do_parallel_pages: bpy.props.BoolProperty(
+        name="Parallel Pages", description="Render the pages of the document in separate processes",
+        default=False)
     output_dpi: bpy.props.FloatProperty(
         name="Resolution (DPI)", description="Resolution of images in pixels per inch",
         default=90, min=1, soft_min=30, soft_max=600, subtype="UNSIGNED")
@@ -819,9 +894,73 @@ class ExportPaperModel(bpy.types.Operator):
     file_format: bpy.props.EnumProperty(
         name="Document Format", description="File format of the exported net",
         default='PDF', items=[
-            ('PDF', "PDF", "Adobe Portable Document Format 1.4"),
+            ('PDF', "PDF", "Adobe Portable Document Format"),
             ('SVG', "SVG", "W3C Scalable Vector Graphics"),
+            ('DXF', "DXF", "Drawing Exchange Format for CAD and CAM software, lines and text only"),
+            ('GCODE', "G-code", "Toolpath for drag knife cutters, lines only"),
+            ('HPGL', "HPGL", "Toolpath for cutting plotters, lines only"),
+        ])
+    do_compact_svg: bpy.props.BoolProperty(
+        name="Compact Paths", description="Write SVG paths with relative coordinates of limited precision",
+        default=False)
+    svg_precision: bpy.props.IntProperty(
+        name="Decimal Places", description="Number of decimal places of millimeters in compact paths",
+        default=2, min=0, max=6)
+    simplify_tolerance: bpy.props.FloatProperty(
+        name="Simplify", description="Leave out points of straight runs that are closer than this to the line",
+        default=0.00001, min=0, soft_max=0.001, step=0.001, precision=5, subtype="UNSIGNED", unit="LENGTH")
+    do_svgz: bpy.props.BoolProperty(
+        name="Compress (.svgz)", description="Write gzip compressed SVG files",
+        default=False)
+    do_object_streams: bpy.props.BoolProperty(
+        name="Compressed PDF 1.5", description="Write binary streams, object streams and a cross-reference stream "
+                                               "for smaller files that need a PDF 1.5 reader",
+        default=False)
+    pen_up_command: bpy.props.StringProperty(
+        name="Pen Up", description="Command that lifts the knife; empty for the default (G0 Z5 or PU;)",
+        default="")
+    pen_down_command: bpy.props.StringProperty(
+        name="Pen Down",
+        description="Command that lowers the knife, {depth} stands for the depth in millimeters; "
+                    "empty for the default (G1 Z-{depth:.3f} F300 or PD;)",
+        default="")
+    cut_depth: bpy.props.FloatProperty(
+        name="Cut Depth", description="Depth of the knife when cutting outlines",
+        default=0.0003, min=0, soft_max=0.005, step=0.01, subtype="UNSIGNED", unit="LENGTH")
+    score_depth: bpy.props.FloatProperty(
+        name="Score Depth", description="Depth of the knife when scoring folds",
+        default=0.0001, min=0, soft_max=0.005, step=0.01, subtype="UNSIGNED", unit="LENGTH")
+    packing_method: bpy.props.EnumProperty(
+        name="Packing Method", description="Method of arranging islands on pages",
+        default='BOUNDING_BOX', items=[
+            ('BOUNDING_BOX', "Bounding Boxes", "Place islands by their bounding rectangles"),
+            ('NESTING', "True Shape", "Nest islands by their actual outlines, including tabs")
+        ])
+    nesting_gap: bpy.props.FloatProperty(
+        name="Nesting Gap", description="Minimal distance between nested islands",
+        default=0.002, min=0, soft_max=0.02, step=0.1, subtype="UNSIGNED", unit="LENGTH")
+    nesting_resolution: bpy.props.FloatProperty(
+        name="Nesting Resolution", description="Cell size of the grid used for nesting, smaller is tighter but slower",
+        default=0.001, min=0.0001, soft_max=0.005, step=0.01, precision=4, subtype="UNSIGNED", unit="LENGTH")
+    nesting_rotations: bpy.props.EnumProperty(
+        name="Nesting Rotations", description="Rotations allowed when nesting islands",
+        default='2', items=[
+            ('1', "None", "Keep islands as they were unfolded"),
+            ('2', "Half Turns", "Allow rotating islands upside down"),
+            ('4', "Quarter Turns", "Allow rotating islands by multiples of 90 degrees")
         ])
+    packing_time_limit: bpy.props.FloatProperty(
+        name="Packing Time Limit",
+        description="Seconds spent trying other orders and packers in parallel; zero uses a single heuristic",
+        default=0, min=0, soft_max=30, subtype="UNSIGNED", unit="TIME")
+    do_keep_layout: bpy.props.BoolProperty(
+        name="Keep Layout",
+        description="Remember page layouts next to the exported file and keep unchanged islands in place on re-export",
+        default=False)
+    do_share_sheets: bpy.props.BoolProperty(
+        name="Shared Material Sheets",
+        description="Pack the slices of all ribbed objects together into one document with pages of the material size",
+        default=False)
     image_packing: bpy.props.EnumProperty(
         name="Image Packing Method", description="Method of attaching baked image(s) to the SVG",
         default='ISLAND_EMBED', items=[
@@ -895,9 +1034,14 @@ class ExportPaperModel(bpy.types.Operator):
             print(self.properties)
             self.unfolder.save(self.properties)
             self.report({'INFO'}, "Saved a {}-page document".format(len(self.unfolder.mesh.pages)))
+            for warning in self.unfolder.mesh.warnings:
+                self.report({'WARNING'}, warning)
 
             slices = [obj for obj in bpy.context.scene.objects if obj.name.startswith("Slice")]
-            unfold_all(slices, self.properties)
+            if self.do_share_sheets:
+                unfold_all_shared(slices, self.properties)
+            else:
+                unfold_all(slices, self.properties)
 
             return {'FINISHED'}
         except unfold.UnfoldError as error:
@@ -948,6 +1092,23 @@ class ExportPaperModel(bpy.types.Operator):
 
         if self.ui_expanded_document:
             box.prop(self.properties, "file_format", text="Format")
+            col = box.column()
+            col.active = self.file_format == 'SVG'
+            col.prop(self.properties, "do_compact_svg")
+            sub = col.column(align=True)
+            sub.active = self.file_format == 'SVG' and self.do_compact_svg
+            sub.prop(self.properties, "svg_precision")
+            sub.prop(self.properties, "simplify_tolerance")
+            col.prop(self.properties, "do_svgz")
+            row = box.row()
+            row.active = self.file_format == 'PDF'
+            row.prop(self.properties, "do_object_streams")
+            col = box.column(align=True)
+            col.active = self.file_format in ('GCODE', 'HPGL')
+            col.prop(self.properties, "pen_up_command")
+            col.prop(self.properties, "pen_down_command")
+            col.prop(self.properties, "cut_depth")
+            col.prop(self.properties, "score_depth")
             box.prop(self.properties, "page_size_preset")
             col = box.column(align=True)
             col.active = self.page_size_preset == 'USER'
@@ -960,7 +1121,28 @@ class ExportPaperModel(bpy.types.Operator):
             col = box.column()
             col.active = self.do_create_stickers or self.do_create_numbers
             col.prop(self.properties, "sticker_width")
+            col.prop(self.properties, "do_parallel_stickers")
+            col.prop(self.properties, "do_keep_curves")
+            col.prop(self.properties, "do_stroke_text")
             box.prop(self.properties, "angle_epsilon")
+            box.prop(self.properties, "do_optimize_order")
+            box.prop(self.properties, "do_common_lines")
+            box.prop(self.properties, "do_layered_output")
+            row = box.row(align=True)
+            row.active = self.do_layered_output
+            row.prop(self.properties, "cut_layer_position")
+            row.prop(self.properties, "score_layer_position")
+            row.prop(self.properties, "engrave_layer_position")
+            box.prop(self.properties, "do_parallel_pages")
+            box.prop(self.properties, "packing_method")
+            col = box.column(align=True)
+            col.active = self.packing_method == 'NESTING'
+            col.prop(self.properties, "nesting_gap")
+            col.prop(self.properties, "nesting_resolution")
+            col.prop(self.properties, "nesting_rotations")
+            box.prop(self.properties, "packing_time_limit")
+            box.prop(self.properties, "do_keep_layout")
+            box.prop(self.properties, "do_share_sheets")
 
             box.prop(self.properties, "output_type")
             col = box.column()
@@ -1,15 +1,22 @@
 import mathutils as M
 import bpy
+import numpy as np
 if __package__ is None or __package__ == '':
     # uses current directory visibility
     import stickers
     import unfold
     import utilities
+    import nesting
+    import packing
+    import collision
 else:
     # uses current package visibility
     from . import stickers
     from . import unfold
     from . import utilities
+    from . import nesting
+    from . import packing
+    from . import collision
 
 
 from itertools import chain, repeat, product, combinations
@@ -25,6 +32,7 @@ class Mesh:
         self.edges = {bmedge: stickers.Edge(bmedge) for bmedge in bmesh.edges}
         self.islands = list()
         self.pages = list()
+        self.warnings = list()  # messages for the user, reported by the export operator
         self.s = stobj
         for edge in self.edges.values():
             edge.choose_main_faces()
@@ -301,18 +309,14 @@ class Mesh:
 
         return True
 
-    def generate_stickers(self, default_width, do_create_numbers=True):
-        """Add sticker faces where they are needed."""
+    def generate_stickers(self, default_width, do_create_numbers=True, parallel=False, curves=False):
+        """Add sticker faces where they are needed.
+        parallel: build the stickers of each island in a worker process
+        curves: keep curved parts of tiled tabs as Bezier curves"""
 
-        def uvedge_priority(uvedge):
-            """Returns whether it is a good idea to stick something on this edge's face"""
-            # TODO: it should take into account overlaps with faces and with other stickers
-            face = uvedge.uvface.face
-            return face.calc_area() / face.calc_perimeter()
-
-        def add_sticker(uvedge, index, target_uvedge, thickness_switch, isreversed=False):
-            uvedge.sticker = stickers.Sticker(uvedge, default_width, index, target_uvedge, thickness_switch, isreversed)
-            uvedge.uvface.island.add_marker(uvedge.sticker)
+        def make_sticker(uvedge):
+            index, target_uvedge, isreversed, width = tabs[uvedge]
+            uvedge.sticker = stickers.Sticker(uvedge, width, index, target_uvedge, self.thickness_switch, isreversed, curves)
 
         def is_index_obvious(uvedge, target):
             if uvedge in (target.neighbor_left, target.neighbor_right):
@@ -321,49 +325,105 @@ class Mesh:
                 return True
             return False
 
-        for edge in self.edges.values():
-            index = None
-            if edge.is_main_cut and len(edge.uvedges) >= 2 and edge.vector.length_squared > 0:
-                target, source = edge.uvedges[:2]
-                if uvedge_priority(target) < uvedge_priority(source):
-                    target, source = source, target
-                target_island = target.uvface.island
-                add_sticker(target, index, source, self.thickness_switch, True)
-
-        for edge in self.edges.values():
+        uvfaces = {face: uvface for island in self.islands for face, uvface in island.faces.items()}
+        faces = list(uvfaces)
+        face_index = {face: i for i, face in enumerate(faces)}
+        # whether it is a good idea to stick something on a face
+        # overlaps with faces and with other stickers are resolved afterwards
+        priority = np.array([face.calc_area() / face.calc_perimeter() for face in faces])
+
+        cut_edges = [edge for edge in self.edges.values()
+                     if edge.is_main_cut and len(edge.uvedges) >= 2 and edge.vector.length_squared > 0]
+        first = np.array([face_index[edge.uvedges[0].uvface.face] for edge in cut_edges], dtype=int)
+        second = np.array([face_index[edge.uvedges[1].uvface.face] for edge in cut_edges], dtype=int)
+        is_swapped = priority[first] < priority[second]
+        pairs = [(source, target) if swap else (target, source)
+                 for (target, source), swap in zip((edge.uvedges[:2] for edge in cut_edges), is_swapped)]
+
+        tabs = dict()  # uvedge -> [index, target uvedge, isreversed, width] of its sticker
+        for target, source in pairs:
+            tabs[target] = [None, source, True, default_width]
+
+        for edge, (target, source) in zip(cut_edges, pairs):
             index = None
-            if edge.is_main_cut and len(edge.uvedges) >= 2 and edge.vector.length_squared > 0:
-                target, source = edge.uvedges[:2]
-                if uvedge_priority(target) < uvedge_priority(source):
-                    target, source = source, target
-                target_island = target.uvface.island
-                if do_create_numbers:
-                    for uvedge in [source] + edge.uvedges[2:]:
-                        target_island.sticker_numbering += 1
-                        index = str(target_island.sticker_numbering)
-                        if u.is_upsidedown_wrong(index):
-                            index += "."
-                        # target_island.add_marker(Arrow(target, default_width, index))
-                        break
-                add_sticker(source, index, target, self.thickness_switch, False)
-
-
-        islands = self.islands
-        uvfaces = {face: uvface for island in islands for face, uvface in island.faces.items()}
-
-        up_vector = M.Vector((0, 0, 1))
-        toppestface = None
-        toppestuvface = None
-        for face, uvface in uvfaces.items():
-            if( not toppestface):
-                toppestface = face
-                toppestuvface = uvface
+            target_island = target.uvface.island
+            if do_create_numbers:
+                target_island.sticker_numbering += 1
+                index = str(target_island.sticker_numbering)
+                if u.is_upsidedown_wrong(index):
+                    index += "."
+                # target_island.add_marker(Arrow(target, default_width, index))
+            tabs[source] = [index, target, False, default_width]
+
+        stickers.sticker_templates.reset_stats()
+        if not (parallel and self.build_stickers_parallel(tabs, curves)):
+            for uvedge in tabs:
+                make_sticker(uvedge)
+        self.avoid_sticker_collisions(tabs, make_sticker)
+        for uvedge in tabs:
+            uvedge.uvface.island.add_marker(uvedge.sticker)
 
-            if((face.normal-up_vector).length < (toppestface.normal-up_vector).length):
-                toppestface = face
-                toppestuvface = uvface
-        self.add_hole(toppestuvface)
+        if faces:
+            # the pour hole goes onto the face that points up the most
+            normals = np.array([tuple(face.normal) for face in faces])
+            toppest = int(np.argmin(np.linalg.norm(normals - (0, 0, 1), axis=1)))
+            self.add_hole(uvfaces[faces[toppest]])
+
+    def build_stickers_parallel(self, tabs, curves=False):
+        """Build the stickers of each island in a worker process and attach the results to their uvedges
+        tabs: {uvedge: [index, target uvedge, isreversed, width]}
+        returns False if no worker processes are available"""
+        pool = packing.process_pool()
+        if pool is None:
+            return False
+        island_tabs = dict()
+        for uvedge in tabs:
+            island_tabs.setdefault(uvedge.uvface.island, list()).append(uvedge)
+        groups = list(island_tabs.values())
+        payloads = [[stickers.sticker_payload(uvedge, *tabs[uvedge], self.thickness_switch, curves) for uvedge in uvedges]
+                    for uvedges in groups]
+        with pool:
+            for uvedges, geometry in zip(groups, pool.map(stickers.build_stickers, payloads)):
+                for uvedge, data in zip(uvedges, geometry):
+                    uvedge.sticker = stickers.Sticker.restore(uvedge, data)
+        return True
 
+    def avoid_sticker_collisions(self, tabs, make_sticker, rounds=3):
+        """Rebuild stickers that overlap faces or other stickers of their island.
+        Tiled tabs swap their pins and holes to the other side of the edge, glue tabs get narrower.
+        tabs: {uvedge: [index, target uvedge, isreversed, width]}, changed in place
+        make_sticker: function that (re)creates the sticker of an uvedge from tabs"""
+        island_tabs = dict()
+        for uvedge in tabs:
+            island_tabs.setdefault(uvedge.uvface.island, list()).append(uvedge)
+        swapped = set()
+        pending = set(tabs)
+        for attempt in range(rounds + 1):
+            collisions = set()
+            for island in {uvedge.uvface.island for uvedge in pending}:
+                collisions.update(sticker_collisions(island, island_tabs[island], pending))
+            if not collisions or attempt == rounds:
+                break
+            pending = set()
+            for uvedge in collisions:
+                tab = tabs[uvedge]
+                if uvedge.type in ('pin', 'tooth'):
+                    if uvedge in swapped:
+                        continue
+                    other = tab[1]
+                    swapped.update((uvedge, other))
+                    tab[2] = not tab[2]
+                    tabs[other][2] = not tabs[other][2]
+                    pending.update((uvedge, other))
+                else:
+                    tab[3] /= 2
+                    pending.add(uvedge)
+            if not pending:
+                break
+            for uvedge in pending:
+                make_sticker(uvedge)
+        if collisions:
+            self.warnings.append("{} stickers still overlap other parts of their islands".format(len(collisions)))
 
     def generate_numbers_alone(self, size):
         global_numbering = 0
@@ -391,6 +451,7 @@ class Mesh:
         for island in self.islands:
             if title_height:
                 island.title = "[{}] {}".format(island.abbreviation, island.label)
+                island.title_height = title_height
             points = [vertex.co for vertex in set(island.vertices.values())] + island.fake_vertices
 
 
@@ -420,50 +481,11 @@ class Mesh:
     def largest_island_ratio(self, cage_size):
         return max(i / p for island in self.islands for (i, p) in zip(island.bounding_box, cage_size))
 
-    def fit_islands(self, cage_size):
-        """Move islands so that they fit onto pages, based on their bounding boxes"""
-
-        def try_emplace(island, page_islands, stops_x, stops_y, occupied_cache):
-            """Tries to put island to each pair from stops_x, stops_y
-            and checks if it overlaps with any islands present on the page.
-            Returns True and positions the given island on success."""
-            bbox_x, bbox_y = island.bounding_box.xy
-            for x in stops_x:
-                if x + bbox_x > cage_size.x:
-                    continue
-                for y in stops_y:
-                    if y + bbox_y > cage_size.y or (x, y) in occupied_cache:
-                        continue
-                    for i, obstacle in enumerate(page_islands):
-                        # if this obstacle overlaps with the island, try another stop
-                        if (x + bbox_x > obstacle.pos.x and
-                                obstacle.pos.x + obstacle.bounding_box.x > x and
-                                y + bbox_y > obstacle.pos.y and
-                                obstacle.pos.y + obstacle.bounding_box.y > y):
-                            if x >= obstacle.pos.x and y >= obstacle.pos.y:
-                                occupied_cache.add((x, y))
-                            # just a stupid heuristic to make subsequent searches faster
-                            if i > 0:
-                                page_islands[1:i + 1] = page_islands[:i]
-                                page_islands[0] = obstacle
-                            break
-                    else:
-                        # if no obstacle called break, this position is okay
-                        island.pos.xy = x, y
-                        page_islands.append(island)
-                        stops_x.append(x + bbox_x)
-                        stops_y.append(y + bbox_y)
-                        return True
-            return False
-
-        def drop_portion(stops, border, divisor):
-            stops.sort()
-            # distance from left neighbor to the right one, excluding the first stop
-            distances = [right - left for left, right in zip(stops, chain(stops[2:], [border]))]
-            quantile = sorted(distances)[len(distances) // divisor]
-            return [stop for stop, distance in zip(stops, chain([quantile], distances)) if distance >= quantile]
-
-        for island in self.islands:
+    def fit_islands(self, cage_size, time_limit=0, islands=None):
+        """Move islands (all by default) so that they fit onto new pages, based on their bounding boxes
+        if given a time limit, try several orders and packers in parallel and keep the best layout"""
+        islands = self.islands if islands is None else islands
+        for island in islands:
             print("Too big x:"+str(island.bounding_box.x)+" "+str(cage_size.x))
             print("Too big y:"+str(island.bounding_box.y)+" "+str(cage_size.y))
             if (island.bounding_box.x > cage_size.x or island.bounding_box.y > cage_size.y ):
@@ -473,25 +495,61 @@ class Mesh:
                     "Export failed, sorry.")
 
                 break
+        boxes = [tuple(island.bounding_box.xy) for island in islands]
+        cage = tuple(cage_size.xy)
         # sort islands by their diagonal... just a guess
-        remaining_islands = sorted(self.islands, reverse=True, key=lambda island: island.bounding_box.length_squared)
-        page_num = 1  # TODO delete me
-
-        while remaining_islands:
-            # create a new page and try to fit as many islands onto it as possible
-            page = Page(page_num)
-            page_num += 1
-            occupied_cache = set()
-            stops_x, stops_y = [0], [0]
-            for island in remaining_islands:
-                try_emplace(island, page.islands, stops_x, stops_y, occupied_cache)
-                # if overwhelmed with stops, drop a quarter of them
-                if len(stops_x) ** 2 > 4 * len(self.islands) + 100:
-                    stops_x = drop_portion(stops_x, cage_size.x, 4)
-                    stops_y = drop_portion(stops_y, cage_size.y, 4)
-            remaining_islands = [island for island in remaining_islands if island not in page.islands]
+        order = sorted(range(len(boxes)), reverse=True, key=lambda i: boxes[i][0] ** 2 + boxes[i][1] ** 2)
+        if time_limit:
+            areas = [width * height for width, height in boxes]
+            jobs = [(packer, boxes, cage, ordering) for packer in (packing.pack_stops, packing.pack_shelves)
+                    for name, ordering in packing.orderings(boxes, areas, restarts=8)]
+            placements = packing.best_layout(jobs, areas, cage[0] * cage[1], time_limit)
+        else:
+            placements = packing.pack_stops(boxes, order, cage)
+
+        page_count = 1 + max((placement[0] for placement in placements), default=-1)
+        pages = [Page(num) for num in range(len(self.pages) + 1, len(self.pages) + page_count + 1)]
+        for island, (page, x, y, width, height, turns) in zip(islands, placements):
+            island.pos.xy = x, y
+            pages[page].islands.append(island)
+        self.pages.extend(pages)
+
+    def nest_islands(self, cage_size, gap, resolution, rotations=1, time_limit=0, islands=None):
+        """Move islands (all by default) so that they fit onto new pages, based on their actual outlines"""
+        islands = self.islands if islands is None else islands
+        pages = nesting.nest(islands, cage_size, gap, resolution, rotations, time_limit)
+        if pages is None:
+            raise unfold.UnfoldError(
+                "An island is too big to fit onto page of the given size. "
+                "Either downscale the model or find and split that island manually.\n"
+                "Export failed, sorry.")
+        for num, page_islands in enumerate(pages, len(self.pages) + 1):
+            page = Page(num)
+            page.islands = page_islands
             self.pages.append(page)
 
+    def restore_layout(self, pages, hashes):
+        """Put islands back where they were in a previous layout, keeping only pages that did not change
+        pages: for each previous page, a list of (geometry hash, x, y, quarter turns)
+        hashes: geometry hash of each island, before any packing
+        returns the islands that have to be packed anew"""
+        placements, page_count = packing.reuse_layout(pages, hashes)
+        kept = [Page(num) for num in range(len(self.pages) + 1, len(self.pages) + page_count + 1)]
+        for island, placement in zip(self.islands, placements):
+            if placement:
+                page, x, y, turns = placement
+                nesting.rotate_island(island, turns)
+                island.pos.xy = x, y
+                kept[page].islands.append(island)
+        self.pages.extend(kept)
+        return [island for island, placement in zip(self.islands, placements) if placement is None]
+
+    def record_layout(self, hashes):
+        """Describe the current layout in the format accepted by restore_layout"""
+        island_hash = dict(zip(self.islands, hashes))
+        return [[(island_hash[island], island.pos.x, island.pos.y, island.quarter_turns) for island in page.islands]
+                for page in self.pages]
+
     def save_uv(self, cage_size=M.Vector((1, 1)), separate_image=False):
         if separate_image:
             for island in self.islands:
@@ -561,6 +619,22 @@ class Mesh:
         for uv in ignored_uvs:
             uv *= -1
 
+class MeshGroup:
+    """Several Meshes whose islands are arranged into a single document"""
+
+    def __init__(self, meshes):
+        self.meshes = meshes
+        self.islands = [island for mesh in meshes for island in mesh.islands]
+        self.pages = list()
+
+    # packing only needs self.islands and self.pages
+    largest_island_ratio = Mesh.largest_island_ratio
+    fit_islands = Mesh.fit_islands
+    nest_islands = Mesh.nest_islands
+    restore_layout = Mesh.restore_layout
+    record_layout = Mesh.record_layout
+
+
 # class AbstractSweepLine:
 #     def __init__(self):
 #         self.children = list()    
@@ -884,6 +958,31 @@ def join(uvedge_a, uvedge_b, size_limit=None, epsilon=1e-6):
     return island_b
 
 
+def sticker_collisions(island, uvedges, checked):
+    """Return those of the checked uvedges whose stickers overlap faces or other stickers of the island"""
+    uvfaces = list(island.faces.values())
+    face_index = {uvface: i for i, uvface in enumerate(uvfaces)}
+    shapes = [face_shape(uvface) for uvface in uvfaces] + [sticker_shape(uvedge) for uvedge in uvedges]
+    offset = len(uvfaces)
+    checked_indices = [offset + i for i, uvedge in enumerate(uvedges) if uvedge in checked]
+    # a sticker always touches the face it is attached to
+    ignored = {offset + i: {face_index[uvedge.uvface]} for i, uvedge in enumerate(uvedges)}
+    return {uvedges[i - offset] for i in collision.colliding(shapes, checked_indices, ignored)}
+
+
+def face_shape(uvface):
+    polygon = [tuple(uvvertex.co) for uvvertex in uvface.vertices.values()]
+    return collision.Shape(collision.outline(polygon + polygon[:1]), polygon, polygon)
+
+
+def sticker_shape(uvedge):
+    points = [None if vertex.co.x == 0.5 else tuple(vertex.co) for vertex in uvedge.sticker.vertices]
+    # outlines of tiled tabs are open, only glue tabs can contain anything
+    is_closed = uvedge.type not in ('pin', 'tooth') and None not in points
+    return collision.Shape(collision.outline(points), points if is_closed else None,
+                           [point for point in points if point], (tuple(uvedge.va.co), tuple(uvedge.vb.co)))
+
+
 class Page:
     """Container for several Islands"""
     __slots__ = ('islands', 'name', 'image_path')
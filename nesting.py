@@ -0,0 +1,217 @@
+import mathutils as M
+import numpy as np
+from math import floor, ceil, pi
+
+if __package__ is None or __package__ == '':
+    # uses current directory visibility
+    import packing
+else:
+    # uses current package visibility
+    from . import packing
+
+
+class Outline:
+    """Rasterized shape of an island, including its stickers"""
+    __slots__ = ('island', 'masks', 'area')
+
+    def __init__(self, island, resolution, gap_cells, rotations=1):
+        self.island = island
+        mask = rasterize(island_polygons(island), island.bounding_box, resolution)
+        title_cells = ceil(island.title_height / resolution) if island.title else 0
+        # rotated variants, as (quarter turns, raw mask, dilated mask)
+        steps = {1: (0,), 2: (0, 2), 4: (0, 1, 2, 3)}[rotations]
+        self.masks = list()
+        for turns in steps:
+            raw = np.rot90(mask, -turns).copy()
+            # the title is drawn upright along the bottom of the bounding box, however the island is turned
+            raw[:title_cells] = True
+            self.masks.append((turns, raw, dilate(raw, gap_cells)))
+        self.area = int(self.masks[0][1].sum())
+
+
+class Sheet:
+    """Occupancy grid of a single page"""
+    __slots__ = ('grid', 'border', 'islands', 'spectrum', 'free')
+
+    def __init__(self, shape, border):
+        height, width = shape
+        # the grid has a free border so that dilated masks can overlap the page edges
+        self.grid = np.zeros((height + 2 * border, width + 2 * border), dtype=bool)
+        self.border = border
+        self.islands = list()
+        self.spectrum = None
+        self.free = height * width
+
+    def find_position(self, dilated):
+        """Return the lowest grid position where the dilated mask does not collide, or None"""
+        h, w = dilated.shape
+        height, width = self.grid.shape
+        if h > height or w > width:
+            return None
+        if not self.islands:
+            return 0, 0
+        if self.spectrum is None:
+            self.spectrum = np.fft.rfft2(self.grid)
+        kernel = np.zeros(self.grid.shape)
+        kernel[:h, :w] = dilated
+        # cross-correlation of the occupancy and the mask counts overlapping cells for every position
+        overlap = np.fft.irfft2(self.spectrum * np.conj(np.fft.rfft2(kernel)), s=self.grid.shape)
+        candidates = np.argwhere(overlap[:height - h + 1, :width - w + 1] < 0.5)
+        if not len(candidates):
+            return None
+        y, x = candidates[0]
+        return int(x), int(y)
+
+    def occupy(self, raw, x, y):
+        h, w = raw.shape
+        self.grid[y + self.border:y + self.border + h, x + self.border:x + self.border + w] |= raw
+        self.free -= int(raw.sum())
+        self.spectrum = None
+
+
+def island_polygons(island):
+    """Generate all polygons that make up the island: faces and sticker contours; the title is added by Outline"""
+    for uvface in island.faces.values():
+        yield [uvvertex.co for uvvertex in uvface.vertices.values()]
+    for marker in island.markers:
+        contour = list()
+        for vertex in getattr(marker, 'vertices', ()):
+            if vertex.co.x == 0.5:
+                if contour:
+                    yield contour
+                contour = list()
+            else:
+                contour.append(vertex.co)
+        if contour:
+            yield contour
+        yield [point for point in marker.bounds if point.x != 0.5]
+
+
+def rasterize(polygons, size, resolution):
+    """Fill the given polygons into a boolean grid, rows are indexed by y"""
+    shape = int(size.y / resolution) + 1, int(size.x / resolution) + 1
+    mask = np.zeros(shape, dtype=bool)
+    for polygon in polygons:
+        if not polygon:
+            continue
+        points = np.array([(p.x, p.y) for p in polygon]) / resolution
+        # cells touched by the outline are always occupied, which makes the raster conservative
+        directions = np.roll(points, -1, axis=0) - points
+        counts = np.ceil(2 * np.hypot(directions[:, 0], directions[:, 1])).astype(int) + 1
+        segment = np.repeat(np.arange(len(points)), counts)
+        steps = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        t = steps / np.repeat(np.maximum(counts - 1, 1), counts)
+        samples = points[segment] + t[:, np.newaxis] * directions[segment]
+        cells = np.clip(np.floor(samples).astype(int), 0, (shape[1] - 1, shape[0] - 1))
+        mask[cells[:, 1], cells[:, 0]] = True
+        if len(points) < 3:
+            continue
+        x0, y0 = np.clip(np.floor(points.min(axis=0)).astype(int), 0, None)
+        x1, y1 = np.minimum(np.ceil(points.max(axis=0)).astype(int), (shape[1], shape[0]))
+        if x1 <= x0 or y1 <= y0:
+            continue
+        xs, ys = np.meshgrid(np.arange(x0, x1) + 0.5, np.arange(y0, y1) + 0.5)
+        inside = np.zeros(xs.shape, dtype=bool)
+        # even-odd rule, vectorized over the cell centers
+        for (ax, ay), (bx, by) in zip(points, np.roll(points, -1, axis=0)):
+            if ay == by:
+                continue
+            crosses = (ay > ys) != (by > ys)
+            inside ^= crosses & (xs < ax + (ys - ay) * (bx - ax) / (by - ay))
+        mask[y0:y1, x0:x1] |= inside
+    return mask
+
+
+def dilate(mask, cells):
+    """Grow the mask by the given number of cells in every direction"""
+    h, w = mask.shape
+    rows = np.zeros((h, w + 2 * cells), dtype=bool)
+    for dx in range(2 * cells + 1):
+        rows[:, dx:dx + w] |= mask
+    result = np.zeros((h + 2 * cells, w + 2 * cells), dtype=bool)
+    for dy in range(2 * cells + 1):
+        result[dy:dy + h, :] |= rows
+    return result
+
+
+def rotate_island(island, turns):
+    """Rotate the island by quarter turns counterclockwise, keeping its bounding box at the origin"""
+    if not turns:
+        return
+    rot = M.Matrix.Rotation(turns * pi / 2, 2)
+    points = [vertex.co for vertex in set(island.vertices.values())] + island.fake_vertices
+    points = [point for point in points if point.x != 0.5]
+    for point in points:
+        point[:] = rot @ point
+    for marker in island.markers:
+        marker.rot = rot @ marker.rot
+    island.quarter_turns = (island.quarter_turns + turns) % 4
+    bottom_left = M.Vector((min(p.x for p in points), min(p.y for p in points)))
+    for point in points:
+        point -= bottom_left
+    island.bounding_box = M.Vector((max(p.x for p in points), max(p.y for p in points)))
+
+
+def nest(islands, cage_size, gap, resolution, rotations=1, time_limit=0):
+    """Place islands onto pages by their outlines, largest first, or by the best of several orders if given time
+    returns a list of pages, each a list of islands with their pos set"""
+    gap_cells = ceil(gap / resolution) + 1  # one more cell covers rounding of rotated masks
+    shape = floor(cage_size.y / resolution), floor(cage_size.x / resolution)
+    outlines = [Outline(island, resolution, gap_cells, rotations) for island in islands]
+    masks = [outline.masks for outline in outlines]
+    areas = [outline.area for outline in outlines]
+    cage = shape, gap_cells
+    if time_limit:
+        sizes = [outline.masks[0][1].shape[::-1] for outline in outlines]
+        jobs = [(place, masks, cage, order) for name, order in packing.orderings(sizes, areas, restarts=8)]
+        jobs.insert(0, jobs.pop(1))  # the reference order is by area
+        placements = packing.best_layout(jobs, areas, shape[0] * shape[1], time_limit)
+    else:
+        placements = place(masks, sorted(range(len(outlines)), reverse=True, key=lambda i: areas[i]), cage)
+    if placements is None:
+        return None
+    pages = [list() for i in range(1 + max((placement[0] for placement in placements), default=-1))]
+    for outline, (page, x, y, width, height, turns) in zip(outlines, placements):
+        rotate_island(outline.island, turns)
+        outline.island.pos.xy = x * resolution, y * resolution
+        pages[page].append(outline.island)
+    return pages
+
+
+def place(masks, order, cage):
+    """Place rasterized outlines in the given order, each onto the first page where it fits
+    masks: for each outline, a list of (quarter turns, raw mask, dilated mask)
+    cage: tuple of the page shape in cells and the dilation border"""
+    shape, border = cage
+    sheets = list()
+    placements = [None] * len(masks)
+    for index in order:
+        area = int(masks[index][0][1].sum())
+        for page, sheet in enumerate(chain_new_sheet(sheets, shape, border)):
+            best = None
+            if area <= sheet.free:
+                for turns, raw, dilated in masks[index]:
+                    position = sheet.find_position(dilated)
+                    if position is not None:
+                        x, y = position
+                        key = (y + raw.shape[0], x)
+                        if best is None or key < best[0]:
+                            best = key, turns, raw, x, y
+            if best:
+                _, turns, raw, x, y = best
+                sheet.occupy(raw, x, y)
+                sheet.islands.append(index)
+                placements[index] = page, x, y, raw.shape[1], raw.shape[0], turns
+                break
+            elif not sheet.islands:
+                # does not fit even onto an empty page
+                return None
+    return placements
+
+
+def chain_new_sheet(sheets, shape, border):
+    """Iterate over existing sheets, then append and yield a new one"""
+    yield from sheets
+    sheet = Sheet(shape, border)
+    sheets.append(sheet)
+    yield sheet
@@ -0,0 +1,220 @@
+import random
+import sys
+import time
+from collections import defaultdict
+from itertools import chain
+from math import ceil
+
+# This module works on plain tuples only, so that packing jobs can be sent to worker processes.
+# A placement is a tuple (page, x, y, width, height, quarter_turns) for each packed item.
+
+
+def pack_stops(boxes, order, cage):
+    """Place boxes (width, height) in the given order at stops made by the corners of already placed boxes"""
+    cage_x, cage_y = cage
+    placements = [None] * len(boxes)
+
+    def try_emplace(index, page_boxes, stops_x, stops_y, occupied_cache):
+        """Tries to put box to each pair from stops_x, stops_y
+        and checks if it overlaps with any boxes present on the page.
+        Returns True and records the placement on success."""
+        bbox_x, bbox_y = boxes[index]
+        for x in stops_x:
+            if x + bbox_x > cage_x:
+                continue
+            for y in stops_y:
+                if y + bbox_y > cage_y or (x, y) in occupied_cache:
+                    continue
+                for i, obstacle in enumerate(page_boxes):
+                    _, obstacle_x, obstacle_y, obstacle_w, obstacle_h, _ = placements[obstacle]
+                    # if this obstacle overlaps with the box, try another stop
+                    if (x + bbox_x > obstacle_x and obstacle_x + obstacle_w > x and
+                            y + bbox_y > obstacle_y and obstacle_y + obstacle_h > y):
+                        if x >= obstacle_x and y >= obstacle_y:
+                            occupied_cache.add((x, y))
+                        # just a stupid heuristic to make subsequent searches faster
+                        if i > 0:
+                            page_boxes[1:i + 1] = page_boxes[:i]
+                            page_boxes[0] = obstacle
+                        break
+                else:
+                    # if no obstacle called break, this position is okay
+                    placements[index] = (page_num, x, y, bbox_x, bbox_y, 0)
+                    page_boxes.append(index)
+                    stops_x.append(x + bbox_x)
+                    stops_y.append(y + bbox_y)
+                    return True
+        return False
+
+    def drop_portion(stops, border, divisor):
+        stops.sort()
+        # distance from left neighbor to the right one, excluding the first stop
+        distances = [right - left for left, right in zip(stops, chain(stops[2:], [border]))]
+        quantile = sorted(distances)[len(distances) // divisor]
+        return [stop for stop, distance in zip(stops, chain([quantile], distances)) if distance >= quantile]
+
+    remaining = list(order)
+    page_num = 0
+    while remaining:
+        # create a new page and try to fit as many boxes onto it as possible
+        occupied_cache = set()
+        stops_x, stops_y = [0], [0]
+        page_boxes = list()
+        for index in remaining:
+            try_emplace(index, page_boxes, stops_x, stops_y, occupied_cache)
+            # if overwhelmed with stops, drop a quarter of them
+            if len(stops_x) ** 2 > 4 * len(boxes) + 100:
+                stops_x = drop_portion(stops_x, cage_x, 4)
+                stops_y = drop_portion(stops_y, cage_y, 4)
+        if not page_boxes:
+            return None
+        remaining = [index for index in remaining if placements[index] is None]
+        page_num += 1
+    return placements
+
+
+def pack_shelves(boxes, order, cage):
+    """Place boxes in the given order onto horizontal shelves, first fit over all open shelves"""
+    cage_x, cage_y = cage
+    placements = [None] * len(boxes)
+    shelves = list()  # page, y, height, filled width
+    pages_top = list()
+    for index in order:
+        width, height = boxes[index]
+        if width > cage_x or height > cage_y:
+            return None
+        for shelf in shelves:
+            page, y, shelf_height, filled = shelf
+            if height <= shelf_height and filled + width <= cage_x:
+                placements[index] = (page, filled, y, width, height, 0)
+                shelf[3] += width
+                break
+        else:
+            page = next((page for page, top in enumerate(pages_top) if top + height <= cage_y), None)
+            if page is None:
+                page = len(pages_top)
+                pages_top.append(0)
+            placements[index] = (page, 0, pages_top[page], width, height, 0)
+            shelves.append([page, pages_top[page], height, width])
+            pages_top[page] += height
+    return placements
+
+
+def reuse_layout(pages, keys):
+    """Keep the pages of a previous layout whose items are all still present.
+    pages: for each previous page, a list of (key, x, y, quarter_turns)
+    keys: current key of each item; items with equal keys are interchangeable
+    returns a placement (page, x, y, quarter_turns) or None for each item, and the number of kept pages"""
+    available = defaultdict(list)
+    for index, key in enumerate(keys):
+        available[key].append(index)
+    placements = [None] * len(keys)
+    page_count = 0
+    for entries in pages:
+        needed = defaultdict(int)
+        for key, *_ in entries:
+            needed[key] += 1
+        if not entries or any(len(available[key]) < count for key, count in needed.items()):
+            # some island on this page has changed, the rest of them will be packed anew
+            continue
+        for key, x, y, turns in entries:
+            placements[available[key].pop()] = page_count, x, y, turns
+        page_count += 1
+    return placements, page_count
+
+
+def orderings(sizes, areas, restarts=0, seed=0):
+    """Generate named orders of items: by diagonal, area, height, width and randomized restarts"""
+    indices = range(len(sizes))
+    keys = {
+        'diagonal': lambda i: sizes[i][0] ** 2 + sizes[i][1] ** 2,
+        'area': lambda i: areas[i],
+        'height': lambda i: sizes[i][1],
+        'width': lambda i: sizes[i][0],
+        'perimeter': lambda i: sizes[i][0] + sizes[i][1]}
+    for name, key in keys.items():
+        yield name, sorted(indices, reverse=True, key=key)
+    for restart in range(restarts):
+        # perturbed sorting keeps large items early, which random shuffling alone would not
+        rng = random.Random(seed + restart)
+        weights = [areas[i] * rng.uniform(0.6, 1.4) for i in indices]
+        yield "random {}".format(restart), sorted(indices, reverse=True, key=lambda i: weights[i])
+
+
+def evaluate(placements, areas):
+    """Score a layout: fewer pages first, then higher fill ratio of the used page extents"""
+    page_count = 1 + max(placement[0] for placement in placements)
+    extents = [[0, 0] for page in range(page_count)]
+    for page, x, y, width, height, turns in placements:
+        extent = extents[page]
+        extent[0], extent[1] = max(extent[0], x + width), max(extent[1], y + height)
+    used = sum(width * height for width, height in extents)
+    return page_count, -(sum(areas) / used if used else 0)
+
+
+def run_job(packer, items, cage, order, areas):
+    """Worker entry point: pack in one order and score the result"""
+    placements = packer(items, order, cage)
+    if placements is None:
+        return None, None
+    return evaluate(placements, areas), placements
+
+
+def process_pool(workers=None):
+    """Return a process pool, or None where worker processes could not import this add-on"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    # Blender embeds Python: spawned processes would have to import the add-on without bpy,
+    # while forked ones inherit the loaded modules. Forking a multithreaded process without exec
+    # is only safe enough on Linux; macOS may crash or deadlock in the child.
+    if not sys.platform.startswith('linux') or 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+
+
+def stop_pool(pool):
+    """Cancel pending jobs and terminate the workers, so that no job keeps running after a time limit"""
+    # the executor forgets its processes on shutdown
+    processes = list((getattr(pool, '_processes', None) or dict()).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def best_layout(jobs, areas, capacity, time_limit, workers=None):
+    """Run packing jobs (packer, items, cage, order) concurrently and return the best placements.
+    The first job is the reference and always gets completed; the others are only used within the time limit.
+    Stops early when a layout reaches the lower bound of total area divided by page capacity."""
+    from concurrent.futures import as_completed, TimeoutError
+    lower_bound = max(1, ceil(sum(areas) / capacity - 1e-9))
+    deadline = time.monotonic() + time_limit
+    best_score, best_placements = None, None
+
+    def consider(score, placements):
+        nonlocal best_score, best_placements
+        if score is not None and (best_score is None or score < best_score):
+            best_score, best_placements = score, placements
+        return best_score is not None and best_score[0] <= lower_bound
+
+    pool = process_pool(workers)
+    if pool is None:
+        for i, job in enumerate(jobs):
+            if consider(*run_job(*job, areas)) or (i > 0 and time.monotonic() > deadline):
+                break
+        return best_placements
+
+    # the reference job runs here while the workers try the other orders,
+    # so the workers can be terminated once the time is up without losing it
+    futures = [pool.submit(run_job, *job, areas) for job in jobs[1:]]
+    try:
+        if not consider(*run_job(*jobs[0], areas)):
+            for future in as_completed(futures, timeout=max(0, deadline - time.monotonic())):
+                if consider(*future.result()):
+                    break
+    except TimeoutError:
+        pass
+    finally:
+        stop_pool(pool)
+    return best_placements
@@ -1,20 +1,52 @@
 import mathutils as M
 import os.path as os_path
+import struct
 from itertools import chain, repeat, product, combinations
 
 
 
 if __package__ is None or __package__ == '':
     # uses current directory visibility
-    import stickers
+    import display
 else:
     # uses current package visibility
-    from . import stickers
+    from . import display
+
+class String(str):
+    """PDF text string, written in parentheses instead of as a name"""
+    __slots__ = ()
+
+
+class EncodedStream(str):
+    """Stream data that has already been compressed and encoded"""
+    __slots__ = ()
+
+
+class CompressedStream(bytes):
+    """Stream data that has already been compressed, to be written as binary"""
+    __slots__ = ()
+
+
+def encode(data):
+    from base64 import a85encode
+    from zlib import compress
+    if hasattr(data, "encode"):
+        data = data.encode()
+    return EncodedStream(a85encode(compress(data), adobe=True, wrapcol=250)[2:].decode())
+
+
+def compress(data):
+    import zlib
+    if hasattr(data, "encode"):
+        data = data.encode()
+    return CompressedStream(zlib.compress(data))
+
 
 class PDF:
     """Simple PDF exporter"""
 
     mm_to_pt = 72 / 25.4
+    objects_per_stream = 100
     character_width_packed = {
         191: "'", 222: 'ijl\x82\x91\x92',
         278: '|¦\x00\x01\x02\x03\x04\x05\x06\x07\x08\t\n\x0b\x0c\r\x0e\x0f\x10\x11\x12\x13\x14\x15\x16\x17\x18\x19\x1a\x1b\x1c\x1d\x1e\x1f !,./:;I[\\]ft\xa0·ÌÍÎÏìíîï',
@@ -26,10 +58,16 @@ class PDF:
 
     def __init__(self, page_size: M.Vector, style, margin, pure_net=True, angle_epsilon=0):
         self.page_size = page_size
-        self.style = style
-        self.margin = M.Vector((margin, margin))
+        self.style = display.Style(style)
+        self.margin = margin
         self.pure_net = pure_net
         self.angle_epsilon = angle_epsilon
+        self.optimize_order = False  # sort paths for short travel of a cutter
+        self.common_lines = False  # cut lines shared by touching islands once
+        self.parallel = False  # render page contents in worker processes
+        self.stroke_text = False  # draw labels as single-stroke lettering instead of font text
+        self.object_streams = False  # write PDF 1.5 with binary streams, object streams and a cross-reference stream
+        self.layers = ()  # machine layers in the order of output, see display.LAYERS; empty to group by islands
 
     def text_width(self, text, scale=None):
         return (scale or self.text_size) * sum(self.character_width.get(c, 556) for c in text) / 1000
@@ -43,40 +81,114 @@ class PDF:
             "Filter": ["ASCII85Decode", "FlateDecode"], "stream": data}
         return image
 
-    def write(self, mesh, filename):
-        def format_dict(obj, refs=tuple()):
-            return "<< " + "".join(
-                "/{} {}\n".format(key, format_value(value, refs)) for (key, value) in obj.items()) + ">>"
+    def path_operators(self, paths, paint):
+        """Return content stream operators that construct the given display.Paths and paint them"""
+        operators = {display.MOVETO: "m", display.LINETO: "l"}
+        commands = list()
+        curve = 0
+        for code, (x, y) in zip(paths.codes.tolist(), (1000 * paths.points).tolist()):
+            if code == display.CLOSEPOLY:
+                commands.append("h")
+            elif code == display.CURVE4:
+                # control points of a curve are followed by its end point and the operator
+                curve = (curve + 1) % 3
+                commands.append("{:.6f} {:.6f}{}".format(x, y, "" if curve else " c"))
+            else:
+                commands.append("{:.6f} {:.6f} {}".format(x, y, operators[code]))
+        commands.append(paint)
+        return " ".join(commands)
 
-        def line_through_simple(seq):
+    def page_images(self, drawing):
+        """Embedded images of a page, in the order of their resource names Im1, Im2..."""
+        return [island.image for island in drawing.islands if island.image and island.image.data]
 
-            return "".join(
-                "{0.x:.6f} {0.y:.6f} {1} ".format(1000 * v.co, c) for (v, c) in zip(seq, chain("m", repeat("l"))))
+    def island_commands(self, island):
+        """Content stream operators of an island by the class of elements, in the order of drawing"""
+        commands = dict()
+        if island.sticker_fill and self.style.sticker_fill[3] > 0:
+            commands["sticker"] = [
+                "/Gsticker gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} rg".format(self.style.sticker_fill),
+                self.path_operators(island.sticker_fill, "f")]
+        if island.freestyle:
+            commands["freestyle"] = [
+                "/Gfreestyle gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.freestyle_color),
+                self.path_operators(island.freestyle, "S")]
+        if (island.convex or island.concave) and not self.pure_net and self.style.use_inbg:
+            commands["inner_background"] = [
+                "/Ginbg gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.inbg_color),
+                self.path_operators(island.convex + island.concave, "S")]
+        if island.convex:
+            commands["convex"] = [
+                "/Gconvex gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.convex_color),
+                self.path_operators(island.convex, "S")]
+        if island.concave:
+            commands["concave"] = [
+                "/Gconcave gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.concave_color),
+                self.path_operators(island.concave, "S")]
+        if island.outer:
+            data_outer = self.path_operators(island.outer, "S")
+            if not self.pure_net and self.style.use_outbg:
+                commands["outer_background"] = [
+                    "/Goutbg gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.outbg_color), data_outer]
+            commands["outer"] = [
+                "/Gouter gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.outer_color), data_outer]
+        if island.lettering:
+            commands["lettering"] = [
+                "/Gtext gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.text_color),
+                self.path_operators(island.lettering, "S")]
+        if island.texts:
+            commands["text"] = ["/Gtext gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} rg".format(self.style.text_color)]
+            for label, position, matrix, size in island.texts:
+                commands["text"].append(self.command_text.format(
+                    label=label,
+                    pos=1000 * position,
+                    mat=matrix,
+                    align=-500 * self.text_width(label, size),
+                    size=1000 * size))
+        return commands
 
+    def page_content(self, drawing):
+        """Return the content stream of a display.PageDrawing"""
+        commands = ["{0:.6f} 0 0 {0:.6f} 0 0 cm".format(self.mm_to_pt)]
+        images = 0
+        islands = list()
+        for island in drawing.islands:
+            image = None
+            if island.image and island.image.data:
+                images += 1
+                image = self.command_image.format(
+                    pos=1000 * island.image.pos, size=1000 * island.image.size, name="Im{}".format(images))
+            islands.append((image, self.island_commands(island)))
 
-        def line_through_sticker(seq):
-            lists = list()
-            curr = list()
-            for point in seq:
-                # print(point.co)
-                if(point.co.x == 0.5):
-                    lists.append(curr)
-                    curr = list()
-                    # print("DELIM")
-                else:
-                    curr.append(point)
-            lists.append(curr)
+        if self.layers:
+            # images are not for the machine, they stay below all layers
+            commands.extend(image for image, elements in islands if image)
+            for identifier, label, classes in self.layers:
+                commands.append("/OC /{} BDC".format(identifier.lower()))
+                for image, elements in islands:
+                    commands.extend(chain.from_iterable(elements.get(name, ()) for name in classes))
+                commands.append("EMC")
+        else:
+            for image, elements in islands:
+                if image:
+                    commands.append(image)
+                commands.extend(chain.from_iterable(elements.values()))
+        return "\n".join(commands)
 
-            finalstring = ""
-            for sublist in lists:
-                finalstring +=  "".join(
-                    "{0.x:.6f} {0.y:.6f} {1} ".format(1000 * v.co, c) for (v, c) in zip(sublist, chain("m", repeat("l"))))
+    def page_stream(self, drawing):
+        if self.object_streams:
+            return compress(self.page_content(drawing))
+        return encode(self.page_content(drawing))
 
-            return finalstring
+    def write(self, mesh, filename):
+        def format_dict(obj, refs):
+            return "<< " + "".join(
+                "/{} {}\n".format(key, format_value(value, refs)) for (key, value) in obj.items()) + ">>"
 
-        def format_value(value, refs=tuple()):
-            if value in refs:
-                return "{} 0 R".format(refs.index(value) + 1)
+        def format_value(value, refs):
+            # objects are told apart by identity, so that equal pages still get their own references
+            if id(value) in refs:
+                return "{} 0 R".format(refs[id(value)])
             elif type(value) is dict:
                 return format_dict(value, refs)
             elif type(value) in (list, tuple):
@@ -87,33 +199,33 @@ class PDF:
                 return "{:.6f}".format(value)
             elif type(value) is bool:
                 return "true" if value else "false"
+            elif type(value) is String:
+                return "({})".format(value)
             else:
                 return "/{}".format(value)  # this script can output only PDF names, no strings
 
-        def write_object(index, obj, refs, f, stream=None):
-            byte_count = f.write("{} 0 obj\n".format(index))
+        def stream_data(stream):
+            """Filter and bytes of stream data, compressed as the document requires"""
+            if type(stream) is EncodedStream:
+                return ["ASCII85Decode", "FlateDecode"], stream.encode()
+            if type(stream) is CompressedStream:
+                return "FlateDecode", bytes(stream)
+            return stream_data(compress(stream) if self.object_streams else encode(stream))
+
+        def format_object(index, obj, refs):
+            """Return the bytes of an indirect object"""
+            stream = None
             if type(obj) is not dict:
                 stream, obj = obj, dict()
             elif "stream" in obj:
+                obj = dict(obj)
                 stream = obj.pop("stream")
-            if stream:
-                if True or type(stream) is bytes:
-                    obj["Filter"] = ["ASCII85Decode", "FlateDecode"]
-                    stream = encode(stream)
-                obj["Length"] = len(stream)
-            byte_count += f.write(format_dict(obj, refs))
-            if stream:
-                byte_count += f.write("\nstream\n")
-                byte_count += f.write(stream)
-                byte_count += f.write("\nendstream")
-            return byte_count + f.write("\nendobj\n")
-
-        def encode(data):
-            from base64 import a85encode
-            from zlib import compress
-            if hasattr(data, "encode"):
-                data = data.encode()
-            return a85encode(compress(data), adobe=True, wrapcol=250)[2:].decode()
+            if stream is None:
+                return b"%d 0 obj\n%s\nendobj\n" % (index, format_dict(obj, refs).encode())
+            obj["Filter"], data = stream_data(stream)
+            obj["Length"] = len(data)
+            return b"%d 0 obj\n%s\nstream\n%s\nendstream\nendobj\n" % (
+                index, format_dict(obj, refs).encode(), data)
 
         page_size_pt = 1000 * self.mm_to_pt * self.page_size
         root = {"Type": "Pages", "MediaBox": [0, 0, page_size_pt.x, page_size_pt.y], "Kids": list()}
@@ -127,8 +239,13 @@ class PDF:
             'SOLID': list(), 'DOT': [dl[0], dl[1]], 'DASH': [dl[1], dl[2]],
             'LONGDASH': [dl[2], dl[1]], 'DASHDOT': [dl[2], dl[1], dl[0], dl[1]]}
         styles = {
-            "Gtext": {"ca": self.style.text_color[3], "Font": [font, 1000 * self.text_size]},
+            "Gtext": {
+                "ca": self.style.text_color[3], "CA": self.style.text_color[3], "LW": self.style.line_width * 1000},
             "Gsticker": {"ca": self.style.sticker_fill[3]}}
+        # single-stroke lettering needs no font
+        fonts = {"F1": font} if not self.stroke_text else dict()
+        if fonts:
+            styles["Gtext"]["Font"] = [font, 1000 * self.text_size]
         for name in ("outer", "convex", "concave", "freestyle"):
             gs = {
                 "LW": self.style.line_width * 1000 * getattr(self.style, name + "_width"),
@@ -142,163 +259,89 @@ class PDF:
                 "D": [format_style['SOLID'], 0]}
             styles["G" + name] = gs
 
-        objects = [root, catalog, font]
+        objects = [root, catalog]
+        objects.extend(fonts.values())
         objects.extend(styles.values())
+        # optional content groups show the machine layers in the layer panel of a viewer
+        layers = {
+            identifier.lower(): {"Type": "OCG", "Name": String(label)}
+            for identifier, label, classes in self.layers}
+        if layers:
+            catalog["OCProperties"] = {"OCGs": list(layers.values()), "D": {"Order": list(layers.values())}}
+            objects.extend(layers.values())
 
-        for page in mesh.pages:
-            commands = ["{0:.6f} 0 0 {0:.6f} 0 0 cm".format(self.mm_to_pt)]
-            resources = {"Font": {"F1": font}, "ExtGState": styles, "XObject": dict()}
-            for island in page.islands:
-                commands.append("q 1 0 0 1 {0.x:.6f} {0.y:.6f} cm".format(1000 * (self.margin + island.pos)))
-                if island.embedded_image:
-                    identifier = "Im{}".format(len(resources["XObject"]) + 1)
-                    commands.append(self.command_image.format(1000 * island.bounding_box, identifier))
-                    objects.append(island.embedded_image)
-                    resources["XObject"][identifier] = island.embedded_image
-
-                if island.title:
-                    commands.append(self.command_label.format(
-                        size=1000 * self.text_size,
-                        x=500 * (island.bounding_box.x - self.text_width(island.title)),
-                        y=1000 * 0.2 * self.text_size,
-                        label=island.title))
-
-                data_markers, data_stickerfill, data_outer, data_convex, data_concave, data_freestyle = (list() for i in
-                                                                                                         range(6))
-                for marker in island.markers:
-                    if isinstance(marker, stickers.Sticker):
-                        data_stickerfill.append(line_through_sticker(marker.vertices))
-                        if marker.text:
-                            data_markers.append(self.command_sticker.format(
-                                label=marker.text,
-                                pos=1000 * marker.center,
-                                mat=marker.rot,
-                                align=-500 * self.text_width(marker.text, marker.width),
-                                size=1000 * marker.width))
-                    elif isinstance(marker, stickers.PourHole):
-                        data_stickerfill.append(line_through_sticker(marker.vertices))
-                        if marker.text:
-                            data_markers.append(self.command_sticker.format(
-                                label=marker.text,
-                                pos=1000 * marker.center,
-                                mat=marker.rot,
-                                align=-500 * self.text_width(marker.text, marker.width),
-                                size=1000 * marker.width))
-                    elif isinstance(marker, Arrow):
-                        size = 1000 * marker.size
-                        position = 1000 * (marker.center + marker.size * marker.rot @ M.Vector((0, -0.9)))
-                        data_markers.append(self.command_arrow.format(
-                            index=marker.text,
-                            arrow_pos=1000 * marker.center,
-                            pos=position - 1000 * M.Vector((0.5 * self.text_width(marker.text), 0.4 * self.text_size)),
-                            mat=size * marker.rot,
-                            size=size))
-                    elif isinstance(marker, stickers.NumberAlone):
-                        data_markers.append(self.command_number.format(
-                            label=marker.text,
-                            pos=1000 * marker.center,
-                            mat=marker.rot,
-                            size=1000 * marker.size))
-
-                outer_edges = set(island.boundary)
-                while outer_edges:
-                    data_loop = list()
-                    uvedge = outer_edges.pop()
-                    while 1:
-                        if uvedge.sticker:
-                            data_loop.extend(uvedge.sticker.vertices[1:])
-                        elif uvedge.pourhole:
-                            data_loop.extend(uvedge.pourhole.vertices[1:])
-                        else:
-                            vertex = uvedge.vb if uvedge.uvface.flipped else uvedge.va
-                            data_loop.append(vertex)
-                        uvedge = uvedge.neighbor_right
-                        try:
-                            outer_edges.remove(uvedge)
-                        except KeyError:
-                            break
-                    data_outer.append(line_through_sticker(data_loop) + "s")
-
-                for loop, uvedge in island.edges.items():
-                    edge = mesh.edges[loop.edge]
-                    if edge.is_cut(uvedge.uvface.face) and not (uvedge.sticker or uvedge.pourhole):
-                        continue
-                    data_uvedge = line_through_simple((uvedge.va, uvedge.vb)) + "S"
-                    if edge.freestyle:
-                        data_freestyle.append(data_uvedge)
-                    # each uvedge exists in two opposite-oriented variants; we want to add each only once
-                    # if uvedge.sticker or uvedge.uvface.flipped != (id(uvedge.va) > id(uvedge.vb)):
-                    #     if edge.angle > self.angle_epsilon:
-                    #         # if(edge.is_kerf):
-                    #             # print("ADDED((((((((((((((((((")
-                    #         data_convex.append(data_uvedge)
-                    #     # elif edge.angle < -self.angle_epsilon:
-                    #     else:
-                    #         # if(edge.is_kerf):
-                    #             # print("ADDED))))))))))))))))))")
-                    #         data_concave.append(data_uvedge)
-                    if not uvedge.sticker and uvedge.uvface.flipped != (id(uvedge.va) > id(uvedge.vb)):
-                        if edge.angle > self.angle_epsilon:
-                            data_convex.append(data_uvedge)
-                        else:
-                            data_concave.append(data_uvedge)
-                    elif(uvedge.sticker and (uvedge.type == 'glue' or uvedge.type == 'auto') ):
-                        if edge.angle > self.angle_epsilon:
-                            data_convex.append(data_uvedge)
-                        else:
-                            data_concave.append(data_uvedge)
-                if island.is_inside_out:
-                    data_convex, data_concave = data_concave, data_convex
-
-                if data_stickerfill and self.style.sticker_fill[3] > 0:
-                    commands.append("/Gsticker gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} rg".format(self.style.sticker_fill))
-                    commands.extend(data_stickerfill)
-                if data_freestyle:
-                    commands.append(
-                        "/Gfreestyle gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.freestyle_color))
-                    commands.extend(data_freestyle)
-                if (data_convex or data_concave) and not self.pure_net and self.style.use_inbg:
-                    commands.append("/Ginbg gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.inbg_color))
-                    commands.extend(chain(data_convex, data_concave))
-                if data_convex:
-                    commands.append("/Gconvex gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.convex_color))
-                    commands.extend(data_convex)
-                if data_concave:
-                    commands.append("/Gconcave gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.concave_color))
-                    commands.extend(data_concave)
-                if data_outer:
-                    if not self.pure_net and self.style.use_outbg:
-                        commands.append("/Goutbg gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.outbg_color))
-                        commands.extend(data_outer)
-                    commands.append("/Gouter gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} RG".format(self.style.outer_color))
-                    commands.extend(data_outer)
-                commands.append("/Gtext gs {0[0]:.3f} {0[1]:.3f} {0[2]:.3f} rg".format(self.style.text_color))
-                commands.extend(data_markers)
-                commands.append("Q")
-            content = "\n".join(commands)
+        drawings = [display.draw_page(
+            page, self.page_size, self.margin, self.angle_epsilon, self.text_size, self.optimize_order,
+            self.common_lines, self.stroke_text)
+                    for page in mesh.pages]
+        contents = display.render_pages(self, "page_stream", [(drawing,) for drawing in drawings], self.parallel)
+        for drawing, content in zip(drawings, contents):
+            resources = {"Font": fonts, "ExtGState": styles, "XObject": dict()}
+            if not fonts:
+                del resources["Font"]
+            if layers:
+                resources["Properties"] = layers
+            for image in self.page_images(drawing):
+                identifier = "Im{}".format(len(resources["XObject"]) + 1)
+                objects.append(image.data)
+                resources["XObject"][identifier] = image.data
             page = {"Type": "Page", "Parent": root, "Contents": content, "Resources": resources}
             root["Kids"].append(page)
             objects.extend((page, content))
 
         root["Count"] = len(root["Kids"])
-        with open(filename, "w+") as f:
+        refs = {id(obj): index for index, obj in enumerate(objects, 1)}
+        # optional content and object streams need PDF 1.5
+        out = bytearray(b"%PDF-1.5\n" if layers or self.object_streams else b"%PDF-1.4\n")
+        if not self.object_streams:
             xref_table = list()
-            position = f.write("%PDF-1.4\n")
             for index, obj in enumerate(objects, 1):
-                xref_table.append(position)
-                position += write_object(index, obj, objects, f)
-            xref_pos = position
-            f.write("xref_table\n0 {}\n".format(len(xref_table) + 1))
-            f.write("{:010} {:05} f\n".format(0, 65536))
-            for position in xref_table:
-                f.write("{:010} {:05} n\n".format(position, 0))
-            f.write("trailer\n")
-            f.write(format_dict({"Size": len(xref_table), "Root": catalog}, objects))
-            f.write("\nstartxref\n{}\n%%EOF\n".format(xref_pos))
-
-    command_label = "/Gtext gs BT {x:.6f} {y:.6f} Td ({label}) Tj ET"
-    command_image = "q {0.x:.6f} 0 0 {0.y:.6f} 0 0 cm 1 0 0 -1 0 1 cm /{1} Do Q"
-    command_sticker = "q {mat[0][0]:.6f} {mat[1][0]:.6f} {mat[0][1]:.6f} {mat[1][1]:.6f} {pos.x:.6f} {pos.y:.6f} cm BT {align:.6f} 0 Td /F1 {size:.6f} Tf ({label}) Tj ET Q"
-    command_arrow = "q BT {pos.x:.6f} {pos.y:.6f} Td /F1 {size:.6f} Tf ({index}) Tj ET {mat[0][0]:.6f} {mat[1][0]:.6f} {mat[0][1]:.6f} {mat[1][1]:.6f} {arrow_pos.x:.6f} {arrow_pos.y:.6f} cm 0 0 m 1 -1 l 0 -0.25 l -1 -1 l f Q"
-    command_number = "q {mat[0][0]:.6f} {mat[1][0]:.6f} {mat[0][1]:.6f} {mat[1][1]:.6f} {pos.x:.6f} {pos.y:.6f} cm BT /F1 {size:.6f} Tf ({label}) Tj ET Q"
+                xref_table.append(len(out))
+                out += format_object(index, obj, refs)
+            xref_pos = len(out)
+            out += b"xref\n0 %d\n" % (len(objects) + 1)
+            out += b"0000000000 65535 f \n"
+            out += b"".join(b"%010d 00000 n \n" % position for position in xref_table)
+            out += b"trailer\n%s\n" % format_dict({"Size": len(objects) + 1, "Root": catalog}, refs).encode()
+        else:
+            # a comment with high bytes marks the file as binary
+            out += b"%\xe2\xe3\xcf\xd3\n"
+            # rows of the cross-reference stream: (1, offset, 0) for objects written directly,
+            # (2, object stream, position in it) for packed objects, and the head of the list of free objects
+            xref_table = [(0, 0, 65535)]
+            packed = list()
+            for index, obj in enumerate(objects, 1):
+                if type(obj) is dict and "stream" not in obj:
+                    packed.append((index, obj))
+                    xref_table.append(None)
+                else:
+                    xref_table.append((1, len(out), 0))
+                    out += format_object(index, obj, refs)
+            number = len(objects)
+            for start in range(0, len(packed), self.objects_per_stream):
+                number += 1
+                chunk = packed[start:start + self.objects_per_stream]
+                bodies = [format_dict(obj, refs).encode() + b"\n" for index, obj in chunk]
+                offsets = [0]
+                for body in bodies[:-1]:
+                    offsets.append(offsets[-1] + len(body))
+                header = " ".join("{} {}".format(index, offset) for (index, obj), offset in zip(chunk, offsets))
+                header = header.encode() + b"\n"
+                for position, (index, obj) in enumerate(chunk):
+                    xref_table[index] = (2, number, position)
+                xref_table.append((1, len(out), 0))
+                out += format_object(number, {
+                    "Type": "ObjStm", "N": len(chunk), "First": len(header),
+                    "stream": compress(header + b"".join(bodies))}, refs)
+            number += 1
+            xref_table.append((1, len(out), 0))
+            xref_pos = len(out)
+            rows = b"".join(struct.pack(">BIH", *row) for row in xref_table)
+            out += format_object(number, {
+                "Type": "XRef", "Size": number + 1, "W": [1, 4, 2], "Root": catalog, "stream": compress(rows)}, refs)
+        out += b"startxref\n%d\n%%%%EOF\n" % xref_pos
+        with open(filename, "wb") as f:
+            f.write(out)
 
+    command_image = "q {size[0]:.6f} 0 0 {size[1]:.6f} {pos[0]:.6f} {pos[1]:.6f} cm 1 0 0 -1 0 1 cm /{name} Do Q"
+    command_text = "q {mat[0][0]:.6f} {mat[1][0]:.6f} {mat[0][1]:.6f} {mat[1][1]:.6f} {pos[0]:.6f} {pos[1]:.6f} cm BT {align:.6f} 0 Td /F1 {size:.6f} Tf ({label}) Tj ET Q"
@@ -1,6 +1,4 @@
-import svglib
 import xml.etree.ElementTree as ET
-import logging
 import mathutils as M
 import os.path as os_path
 import sys
@@ -8,17 +6,21 @@ import bmesh
 import bpy
 import bl_operators
 import functools
-from math import pi, ceil, asin, atan2, floor
-from svgpathtools import parse_path, Line, Path, QuadraticBezier, CubicBezier, Arc
+import numpy as np
+from math import pi, ceil, asin, atan2, floor, acos, tan
+from re import compile as re_compile
+from hashlib import sha1
 import functools
 
 
 if __package__ is None or __package__ == '':
     # uses current directory visibility
     import utilities
+    import tilelib
 else:
     # uses current package visibility
     from . import utilities
+    from . import tilelib
 
 
 class Stickers:
@@ -28,107 +30,196 @@ class Stickers:
         self.glue_edges = []
         self.current_edge = "auto"
 
-    """ returns svg root of svg at path"""
-    def load_svg(self, path):
-        try:
-            doc = ET.parse(path)
-            svg_root = doc.getroot()
-        except Exception as exc:
-            logger.error("Failed to load input file! (%s)" % exc)
-        else:
-            return svg_root
-
     """ returns an array of UVVertices converted from the svg file at path"""
     def svg2uv(self, path):
-        ns = "{http://www.w3.org/2000/svg}"
-        vertices = []
-        svg_root = self.load_svg(path)
-        if svg_root is None:
-            print("SVG import blowed up, no root!")
+        rows = self.svg2points(path)
+        if rows is None:
             return
-
-        for element in svg_root:
-            if element.tag == ns + 'path':
-                path = element.get('d')
-                vertices += map(self.pathToUVVertices, self.vectorize_paths(path))
-
-            elif element.tag == ns + 'polyline':
-                points = element.get('points')
-                points += " 0.5,0.5"
-                vertices += map(self.makeUVVertices, self.vectorize_polylines(points))
-                # print(len(vertices))
-
-            elif element.tag == ns + 'line':
-                vertices += self.vectorize_lines(l)
-            elif element.tag == ns + 'rect':
-                vertices += self.vectorize_rects(r)
-
-        return vertices
+        return [(UVHandle if is_handle else UVVertex)(M.Vector((x, y))) for x, y, is_handle in rows]
+
+    def svg2points(self, path):
+        """Stream the svg file at path into rows (x, y, is_handle) in meters, where (0.5, 0.5) separates contours.
+        Shapes in nested groups are included with all their transforms applied.
+        Returns None if the file cannot be parsed."""
+        rows = []
+        transforms = [(1, 0, 0, 1, 0, 0)]
+        hidden = 0  # depth inside elements whose content is not drawn directly
+        try:
+            for event, element in ET.iterparse(path, events=('start', 'end')):
+                tag = element.tag.rpartition('}')[2]
+                if event == 'start':
+                    transforms.append(compose_transforms(transforms[-1], parse_transform(element.get('transform', ''))))
+                    if tag in ('defs', 'clipPath', 'mask', 'marker', 'pattern', 'symbol', 'style'):
+                        hidden += 1
+                    elif not hidden:
+                        a, b, c, d, e, f = transforms[-1]
+                        # tile SVG units are scaled down to meters
+                        rows += [(0.00001 * (a * x + c * y + e), 0.00001 * (b * x + d * y + f), is_handle)
+                                 if x is not None else (0.5, 0.5, False)
+                                 for x, y, is_handle in self.vectorize_element(tag, element)]
+                else:
+                    transforms.pop()
+                    if tag in ('defs', 'clipPath', 'mask', 'marker', 'pattern', 'symbol', 'style'):
+                        hidden -= 1
+                    # the whole document never has to be in memory
+                    element.clear()
+        except (ET.ParseError, OSError) as exc:
+            print("SVG import blowed up:", path, exc)
+            return None
+        return rows
+
+    def vectorize_element(self, tag, element):
+        """Returns rows (x, y, is_handle) in SVG units for a shape element, with (None, None, False) after each contour"""
+        end = [(None, None, False)]
+        if tag == 'path':
+            return self.vectorize_paths(element.get('d', ''))
+        elif tag in ('polyline', 'polygon'):
+            numbers = svg_numbers(element.get('points', ''))
+            points = [(x, y, False) for x, y in zip(numbers[0::2], numbers[1::2])]
+            if tag == 'polygon' and points:
+                points.append(points[0])
+            return points + end
+        elif tag == 'line':
+            x1, y1, x2, y2 = (svg_length(element, name) for name in ('x1', 'y1', 'x2', 'y2'))
+            return [(x1, y1, False), (x2, y2, False)] + end
+        elif tag == 'rect':
+            x, y, width, height = (svg_length(element, name) for name in ('x', 'y', 'width', 'height'))
+            corners = [(x, y), (x + width, y), (x + width, y + height), (x, y + height), (x, y)]
+            return [(cx, cy, False) for cx, cy in corners] + end
+        elif tag in ('circle', 'ellipse'):
+            cx, cy = svg_length(element, 'cx'), svg_length(element, 'cy')
+            rx = svg_length(element, 'r' if tag == 'circle' else 'rx')
+            ry = svg_length(element, 'r' if tag == 'circle' else 'ry')
+            # four cubic Bezier quarter arcs
+            k = 0.5522847498
+            rows = [(cx + rx, cy, False)]
+            for (x0, y0), (x1, y1) in zip(((1, 0), (0, 1), (-1, 0), (0, -1)), ((0, 1), (-1, 0), (0, -1), (1, 0))):
+                rows += [(cx + rx * (x0 + k * x1), cy + ry * (y0 + k * y1), True),
+                         (cx + rx * (x1 + k * x0), cy + ry * (y1 + k * y0), True),
+                         (cx + rx * x1, cy + ry * y1, False)]
+            return rows + end
+        return []
 
     def vectorize_paths(self, path):
+        """Returns rows (x, y, is_handle) like vectorize_element, where handles are control points of cubic Bezier curves"""
+        # svgpathtools is slow to import and only needed when a tile library gets compiled
+        from svgpathtools import parse_path, Line, QuadraticBezier, CubicBezier, Arc
         paths = parse_path(path)
-        uv_vertices = []
-        NUM_SAMPLES = 10
+        points = []
+        # tile SVG units are scaled by 0.00001 to meters
+        tolerance = FLATNESS / 0.00001
         for subpath in paths:
-            uv_vertices.append(subpath.start)
-            if isinstance(subpath, Line):
-                pass
-            elif isinstance(subpath, CubicBezier) or isinstance(subpath, QuadraticBezier) or isinstance(subpath, Arc):
-                for i in range(NUM_SAMPLES):
-                    uv_vertices.append(subpath.point(i/(NUM_SAMPLES-1)))
-            uv_vertices.append(subpath.end)
-            uv_vertices.append(0.5 + 0.5j)
-        return uv_vertices
-
-
-    def vectorize_polylines(self, points):
-        points = points.replace(",", " ")
-
-        ps = points.split()
-        xs = ps[0::2]  # every second element starting at 0
-        ys = ps[1::2]  # every second element starting at 1
-        lines = []
-
-        for i in range(0, len(xs)):
-            x1 = float(xs[i])
-            y1 = float(ys[i])
-            # fs = [float(i) for i in [x1,y1,x2,y2]]
-            o = {'x1': x1, 'y1': y1}
-            lines.append(o)
-        return lines
-
-    def vectorize_lines(line):
-        return [UVVertex(M.Vector((float(line.attrib['x1']), float(line.attrib['y1']))) * 0.00001), \
-        UVVertex(M.Vector((float(line.attrib['x2']), float(line.attrib['y2']))) * 0.00001)]
-    
-    def vectorize_rects(rect):
-        x1, y1 = float(rect.attrib['x']), float(rect.attrib['y'])
-        width, height = float(rect.attrib['width']), float(rect.attrib['height'])
-        return [UVVertex(M.Vector((x1, y1)) * 0.00001), \
-                UVVertex(M.Vector((x1 + width, y1)) * 0.00001), \
-                UVVertex(M.Vector((x1 + width, y1 + height)) * 0.00001), \
-                UVVertex(M.Vector((x1, y1 + height)) * 0.00001), \
-                UVVertex(M.Vector((x1, y1)) * 0.00001)]
-
-    def makeUVVertices(self, v):
-        if not (v["x1"] == 0.5):
-            v1 = UVVertex(M.Vector((v["x1"], v["y1"])) * 0.00001)  # scaling down to avoid overflow
+            points.append((subpath.start, False))
+            if isinstance(subpath, CubicBezier):
+                points += [(subpath.control1, True), (subpath.control2, True)]
+            elif isinstance(subpath, QuadraticBezier):
+                # degree elevation, the cubic curve is exactly the same
+                points += [(subpath.start + 2 / 3 * (subpath.control - subpath.start), True),
+                           (subpath.end + 2 / 3 * (subpath.control - subpath.end), True)]
+            elif isinstance(subpath, Arc):
+                radius = max(abs(subpath.radius.real), abs(subpath.radius.imag))
+                # the sagitta of each chord must stay within the tolerance
+                step = 2 * acos(max(-1, 1 - tolerance / radius)) if radius else pi
+                count = max(1, ceil(abs(subpath.delta) * pi / 180 / step))
+                points += [(subpath.point(i / count), False) for i in range(1, count)]
+            points.append((subpath.end, False))
+            points.append((None, False))
+        return [(None, None, False) if point is None else (point.real, point.imag, is_handle)
+                for point, is_handle in points]
+
+    def load_geometry(self, filename):
+        return self.svg2uv(os_path.join(tile_directory, filename))
+
+
+def svg_numbers(text):
+    return [float(number) for number in re_numbers.findall(text)]
+
+
+def svg_length(element, name):
+    """Value of a numeric attribute, ignoring its unit"""
+    numbers = svg_numbers(element.get(name, ''))
+    return numbers[0] if numbers else 0
+
+
+def parse_transform(text):
+    """Parse an SVG transform attribute into an affine matrix (a, b, c, d, e, f)"""
+    result = (1, 0, 0, 1, 0, 0)
+    for name, arguments in re_transform.findall(text):
+        values = svg_numbers(arguments)
+        if name == 'matrix' and len(values) == 6:
+            matrix = tuple(values)
+        elif name == 'translate' and values:
+            matrix = (1, 0, 0, 1, values[0], values[1] if len(values) > 1 else 0)
+        elif name == 'scale' and values:
+            matrix = (values[0], 0, 0, values[1] if len(values) > 1 else values[0], 0, 0)
+        elif name == 'rotate' and values:
+            angle = values[0] * pi / 180
+            cx, cy = values[1:3] if len(values) == 3 else (0, 0)
+            rotation = M.Matrix.Rotation(angle, 2)
+            ca, sa = rotation[0][0], rotation[1][0]
+            # rotation about the center (cx, cy)
+            matrix = (ca, sa, -sa, ca, cx - ca * cx + sa * cy, cy - sa * cx - ca * cy)
+        elif name == 'skewX' and values:
+            matrix = (1, 0, tan(values[0] * pi / 180), 1, 0, 0)
+        elif name == 'skewY' and values:
+            matrix = (1, tan(values[0] * pi / 180), 0, 1, 0, 0)
         else:
-            v1 = UVVertex(M.Vector((v["x1"], v["y1"]))  )  # scaling down to avoid overflow
+            continue
+        # transforms in a list are applied from right to left
+        result = compose_transforms(result, matrix)
+    return result
 
-        return v1
 
-    def pathToUVVertices(self, v):
-        if not (v.real == 0.5 and v.imag == 0.5):
-            return UVVertex(M.Vector((v.real, v.imag)) * 0.00001)
-        else:
-            return UVVertex(M.Vector((v.real, v.imag)))
+def compose_transforms(first, second):
+    """Product of two affine matrices: the result applies second, then first"""
+    a1, b1, c1, d1, e1, f1 = first
+    a2, b2, c2, d2, e2, f2 = second
+    return (a1 * a2 + c1 * b2, b1 * a2 + d1 * b2, a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1)
 
-    def load_geometry(self, filename):
-        path_to_stickers = os_path.join(os_path.dirname(__file__), 'Stickers')
-        return self.svg2uv(os_path.join(path_to_stickers, filename))
+
+re_numbers = re_compile(r"[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?")
+re_transform = re_compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+
+
+tile_directory = os_path.join(os_path.dirname(__file__), 'Stickers')
+# largest distance of flattened curves from the exact ones, in meters
+FLATNESS = 0.00001
+
+
+# parsed tile geometry by file name, shared by all tiles and filled at registration
+tile_geometry = dict()
+
+
+def load_tile(filename):
+    """Return the vertices of a tile file, parsing each file only once.
+    The vertex coordinates are frozen because all stickers share them."""
+    geometry = tile_geometry.get(filename)
+    if geometry is None:
+        rows = Stickers().svg2points(os_path.join(tile_directory, filename)) or ()
+        geometry = tile_geometry[filename] = frozen_vertices(rows)
+    return geometry
+
+
+def frozen_vertices(rows):
+    """Make a tuple of vertices from rows (x, y, is_handle) and freeze their coordinates"""
+    vertices = tuple((UVHandle if is_handle else UVVertex)(M.Vector((x, y))) for x, y, is_handle in rows)
+    for vertex in vertices:
+        vertex.co.freeze()
+    return vertices
+
+
+def load_tile_library():
+    """Fill the tile cache from the compiled library, recompiling it if any tile SVG is newer"""
+    for filename, points in tilelib.load_library(tile_directory, Stickers().svg2points).items():
+        tile_geometry[filename] = frozen_vertices(points)
 
 
+@functools.lru_cache(maxsize=None)
+def shared_pattern(pattern_class, *args):
+    """Return a pattern instance shared by all stickers made with the same arguments"""
+    return pattern_class(*args)
+
 
 ## Fundamental stickers
 class AbstractSticker:
@@ -144,9 +235,7 @@ class AbstractSticker:
         self.geometry = self.load_geometry()
 
     def load_geometry(self):
-        s = Stickers()
-        filename = self.filenames[self.thickness_switch]
-        return s.load_geometry(filename)
+        return load_tile(self.filenames[self.thickness_switch])
 
     def getWidth(self):
         return self.width
@@ -181,11 +270,21 @@ class Pin(AbstractSticker):
 
 ## Patterns
 class AbstractPattern:
-    __slots__ = ("tileset", "width")
-    def __init__(self, isreversed, tileset_r, tileset_f):
+    """Immutable once constructed, get instances through shared_pattern"""
+    __slots__ = ("tileset", "width", "isreversed", "geometry", "points", "handles")
+    def __init__(self, isreversed, tileset_r, tileset_f, curves=False):
+        """curves: keep Bezier control points in the geometry, otherwise flatten the curves"""
         self.isreversed = isreversed
         self.tileset = tileset_r if isreversed else tileset_f
         self.width = self.getWidth(self.tileset)
+        self.geometry = tuple(self.getGeometry())
+        for vertex in self.geometry:
+            vertex.co.freeze()
+        self.points = np.array([vertex.tup for vertex in self.geometry], dtype=float).reshape(-1, 2)
+        self.handles = np.array([isinstance(vertex, UVHandle) for vertex in self.geometry], dtype=bool)
+        if not curves:
+            self.points, self.handles = flatten_curves(self.points, self.handles, FLATNESS)
+        self.points.flags.writeable = self.handles.flags.writeable = False
 
     def getWidth(self, tileset):
         if (len(tileset) == 1):
@@ -199,20 +298,19 @@ class AbstractPattern:
         for tile in self.tileset:
             for vi in tile.geometry:
                 if(vi.co.x != 0.5):
-                    vertices.insert(len(vertices), UVVertex(M.Vector((vi.co.x +space, vi.co.y))))
+                    vertices.insert(len(vertices), type(vi)(M.Vector((vi.co.x +space, vi.co.y))))
                 else:
                     vertices.insert(len(vertices), UVVertex(M.Vector((vi.co.x, vi.co.y))))
-                print(vi.co.x + space)
             space += tile.width
         return vertices
 
 class SawtoothPattern(AbstractPattern):
-    def __init__(self, thickness_switch, isreversed):
-        AbstractPattern.__init__(self, isreversed, [Gap(thickness_switch), Tooth(thickness_switch)], [Tooth(thickness_switch), Gap(thickness_switch)])
+    def __init__(self, thickness_switch, isreversed, curves=False):
+        AbstractPattern.__init__(self, isreversed, [Gap(thickness_switch), Tooth(thickness_switch)], [Tooth(thickness_switch), Gap(thickness_switch)], curves)
 
 class PinPattern(AbstractPattern):
-    def __init__(self, thickness_switch, isreversed):
-        AbstractPattern.__init__(self, isreversed, [ Hole(thickness_switch), Connector(thickness_switch)], [Gap(thickness_switch), Pin(thickness_switch)])
+    def __init__(self, thickness_switch, isreversed, curves=False):
+        AbstractPattern.__init__(self, isreversed, [ Hole(thickness_switch), Connector(thickness_switch)], [Gap(thickness_switch), Pin(thickness_switch)], curves)
 
     def getGeometry(self):
         vertices = []
@@ -220,10 +318,9 @@ class PinPattern(AbstractPattern):
         for tile in self.tileset:
             for vi in tile.geometry:
                 if(vi.co.x != 0.5):
-                    vertices.insert(len(vertices), UVVertex(M.Vector((vi.co.x +space, vi.co.y))))
+                    vertices.insert(len(vertices), type(vi)(M.Vector((vi.co.x +space, vi.co.y))))
                 else:
                     vertices.insert(len(vertices), UVVertex(M.Vector((vi.co.x, vi.co.y))))
-                print(vi.co.x + space)
             if(self.isreversed):
                 space += tile.width
             else:
@@ -231,8 +328,29 @@ class PinPattern(AbstractPattern):
         return vertices
 
 class PourHolePattern(AbstractPattern):
-    def __init__(self, isreversed):
-        AbstractPattern.__init__(self, isreversed, [PourHoleTile()], [PourHoleTile()])
+    def __init__(self, isreversed, curves=False):
+        AbstractPattern.__init__(self, isreversed, [PourHoleTile()], [PourHoleTile()], curves)
+
+
+def flatten_curves(points, handles, tolerance):
+    """Replace each cubic Bezier curve (point, handle, handle, point) by as few segments as the tolerance allows
+    returns new arrays of points and handles"""
+    result = list()
+    i = 0
+    while i < len(points):
+        if not handles[i]:
+            result.append(points[i])
+            i += 1
+            continue
+        p0, p1, p2, p3 = points[i - 1], points[i], points[i + 1], points[i + 2]
+        # Wang's formula: enough segments for the chords to stay within the tolerance
+        deviation = max(np.linalg.norm(p0 - 2 * p1 + p2), np.linalg.norm(p1 - 2 * p2 + p3))
+        count = max(1, ceil((0.75 * deviation / tolerance) ** 0.5))
+        t = np.arange(1, count)[:, np.newaxis] / count
+        result.extend((1 - t) ** 3 * p0 + 3 * (1 - t) ** 2 * t * p1 + 3 * (1 - t) * t ** 2 * p2 + t ** 3 * p3)
+        i += 2
+    points = np.array(result, dtype=float).reshape(-1, 2)
+    return points, np.zeros(len(points), dtype=bool)
 
 class UVVertex:
         """Vertex in 2D"""
@@ -248,6 +366,10 @@ class UVVertex:
         def __iter__(self):
             return self
 
+class UVHandle(UVVertex):
+    """Control point of a cubic Bezier curve, always in pairs between two UVVertices"""
+    __slots__ = ()
+
 class UVEdge:
     """Edge in 2D"""
     # Every UVEdge is attached to only one UVFace
@@ -314,9 +436,9 @@ class Island:
     __slots__ = ('mesh', 'faces', 'edges', 'vertices', 'fake_vertices', 'boundary', 'markers',
                  'pos', 'bounding_box',
                  'image_path', 'embedded_image',
-                 'number', 'label', 'abbreviation', 'title',
+                 'number', 'label', 'abbreviation', 'title', 'title_height',
                  'has_safe_geometry', 'is_inside_out',
-                 'sticker_numbering')
+                 'sticker_numbering', 'quarter_turns')
 
     def __init__(self, mesh, face, matrix, normal_matrix, stobj):
         """Create an Island from a single Face"""
@@ -329,12 +451,14 @@ class Island:
         self.label = None
         self.abbreviation = None
         self.title = None
+        self.title_height = 0  # strip along the bottom of the bounding box reserved for the title
         self.pos = M.Vector((0, 0))
         self.image_path = None
         self.embedded_image = None
         self.is_inside_out = False  # swaps concave <-> convex edges
         self.has_safe_geometry = True
         self.sticker_numbering = 0
+        self.quarter_turns = 0  # counterclockwise rotation applied when nesting
 
         uvface = UVFace(stobj, face, self, matrix, normal_matrix)
         self.vertices.update(uvface.vertices)
@@ -347,6 +471,15 @@ class Island:
         self.fake_vertices.extend(marker.bounds)
         self.markers.append(marker)
 
+    def geometry_hash(self):
+        """Digest of the island outline, stickers and size, independent of its position and name"""
+        points = [vertex.co for vertex in set(self.vertices.values())] + self.fake_vertices
+        points.extend(vertex.co for marker in self.markers for vertex in getattr(marker, 'vertices', ()))
+        # adding zero turns -0.0 into 0.0, which would have a different repr
+        rounded = sorted((round(p.x, 6) + 0, round(p.y, 6) + 0) for p in points)
+        rounded.append((round(self.bounding_box.x, 6), round(self.bounding_box.y, 6)))
+        return sha1(repr(rounded).encode()).hexdigest()
+
     def generate_label(self, label=None, abbreviation=None):
         """Assign a name to this island automatically"""
         abbr = abbreviation or self.abbreviation or str(self.number)
@@ -517,8 +650,9 @@ class Sticker:
     """Mark in the document: sticker tab"""
     __slots__ = ('bounds', 'center', 'rot', 'text', 'width', 'vertices', 'sticker')
 
-    def __init__(self, uvedge, default_width, index, other: UVEdge, thickness_switch, isreversed=False):
-        """Sticker is directly attached to the given UVEdge"""
+    def __init__(self, uvedge, default_width, index, other: UVEdge, thickness_switch, isreversed=False, curves=False):
+        """Sticker is directly attached to the given UVEdge
+        curves: keep curved parts of tiled tabs as Bezier curves"""
         first_vertex, second_vertex = (uvedge.va, uvedge.vb) if not uvedge.uvface.flipped else (uvedge.vb, uvedge.va)
         other_first, other_second = (other.va, other.vb) if not other.uvface.flipped else (other.vb, other.va)
 
@@ -534,7 +668,7 @@ class Sticker:
         self.vertices = []
         self.bounds = []
         self.center = (uvedge.va.co + uvedge.vb.co) / 2 # changes if not tile pattern
-        self.sticker = self.generate_sticker(uvedge, default_width, index, other, thickness_switch, isreversed)
+        self.sticker = self.generate_sticker(uvedge, default_width, index, other, thickness_switch, isreversed, curves)
 
         # print(uvedge.type)
         if (uvedge.type != 'pin' and uvedge.type != 'tooth'):
@@ -584,38 +718,106 @@ class Sticker:
             self.bounds = [v3.co, v4.co, self.center] if v3.co != v4.co else [v3.co, self.center]
 
         else:
-            for i in range(len(self.sticker.geometry)):
-                if not (self.sticker.geometry_co[i][0] == 0.5):
-                    vi = UVVertex((second_vertex.co + self.rot @ self.sticker.geometry_co[i]))
-                else:
-                    vi = UVVertex((self.sticker.geometry_co[i]))
-                self.vertices.insert(len(self.vertices), vi)
-                self.bounds.insert(len(self.vertices), vi.co)
-
-            self.vertices.insert(len(self.vertices), first_vertex)
+            points = place_points(self.sticker.points, self.rot, second_vertex.co)
+            self.vertices = [(UVHandle if is_handle else UVVertex)(M.Vector(point))
+                             for point, is_handle in zip(points, self.sticker.handles)]
+            self.bounds = [vi.co for vi in self.vertices]
+            self.vertices.append(first_vertex)
             self.vertices.insert(0, second_vertex)
-            self.bounds.insert(len(self.bounds), self.center)
+            self.bounds.append(self.center)
+
+    @classmethod
+    def restore(cls, uvedge, data):
+        """Recreate a sticker of the uvedge from the output of sticker_geometry"""
+        vertices, bounds, center, rot, width, text = data
+        ends = {'a': uvedge.va, 'b': uvedge.vb}
+        self = cls.__new__(cls)
+        # handles are stored with a third value
+        self.vertices = [ends[item] if isinstance(item, str) else (UVHandle if len(item) == 3 else UVVertex)(
+            M.Vector(item[:2])) for item in vertices]
+        # bounds share their vectors with the vertices, so that moving the island moves both
+        self.bounds = [self.vertices[item].co if isinstance(item, int) else M.Vector(item) for item in bounds]
+        self.center = self.bounds[center] if isinstance(center, int) else M.Vector(center)
+        self.rot = M.Matrix(rot)
+        self.width = width
+        self.text = text
+        self.sticker = None
+        return self
 
-    # Returns: AbstractSticker object
-    def generate_sticker(self, uvedge, default_width, index, other, thickness_switch, isreversed):
+    # Returns: AbstractStickerConstructor object, shared with other edges of the same length
+    def generate_sticker(self, uvedge, default_width, index, other, thickness_switch, isreversed, curves=False):
+        length = (uvedge.va.co - uvedge.vb.co).length
         if (uvedge.type == 'pin'):
-            return PinSticker(uvedge, default_width, index, other, thickness_switch, isreversed)
+            return sticker_templates.get(PinSticker, length, thickness_switch, isreversed, curves)
         if (uvedge.type == 'tooth'):
-            return SawtoothSticker(uvedge, default_width, index, other, thickness_switch, isreversed)
+            return sticker_templates.get(SawtoothSticker, length, thickness_switch, isreversed, curves)
         return None
 
+class DetachedUVEdge:
+    """Stand-in for an UVEdge with just the data that Sticker reads, made from plain coordinates"""
+    __slots__ = ('va', 'vb', 'uvface', 'flipped', 'type', 'neighbor_left', 'neighbor_right')
+
+    def __init__(self, va, vb, flipped=False, type='auto', neighbor_left=None, neighbor_right=None):
+        self.va, self.vb = UVVertex(M.Vector(va)), UVVertex(M.Vector(vb))
+        # Sticker only asks the face whether it is flipped
+        self.uvface = self
+        self.flipped = flipped
+        self.type = type
+        self.neighbor_left = neighbor_left and DetachedUVEdge(neighbor_left, neighbor_left)
+        self.neighbor_right = neighbor_right and DetachedUVEdge(neighbor_right, neighbor_right)
+
+
+def sticker_payload(uvedge, index, target, isreversed, width, thickness_switch, curves=False):
+    """Plain data needed to build the sticker of an uvedge in another process"""
+    neighbor_left = getattr(target.neighbor_left, 'vb', None)
+    neighbor_right = getattr(target.neighbor_right, 'va', None)
+    return ((tuple(uvedge.va.co), tuple(uvedge.vb.co), uvedge.uvface.flipped, uvedge.type),
+            (tuple(target.va.co), tuple(target.vb.co), target.uvface.flipped, target.type,
+             neighbor_left and tuple(neighbor_left.co), neighbor_right and tuple(neighbor_right.co)),
+            index, isreversed, width, thickness_switch, curves)
+
+
+def sticker_geometry(sticker, uvedge):
+    """Describe the sticker by plain data, referring to the ends of the uvedge and to shared vectors by index"""
+    vertices = ['a' if vertex is uvedge.va else 'b' if vertex is uvedge.vb else
+                vertex.tup + (True,) if isinstance(vertex, UVHandle) else tuple(vertex.co)
+                for vertex in sticker.vertices]
+    index = {id(vertex.co): i for i, vertex in enumerate(sticker.vertices)}
+    bounds = [index.get(id(point), tuple(point)) for point in sticker.bounds]
+    center = next((i for i, point in enumerate(sticker.bounds) if point is sticker.center), tuple(sticker.center))
+    return vertices, bounds, center, tuple(tuple(row) for row in sticker.rot), sticker.width, sticker.text
+
+
+def build_stickers(payloads):
+    """Worker entry point: build stickers from the output of sticker_payload, returns their sticker_geometry"""
+    result = list()
+    for uvedge, target, index, isreversed, width, thickness_switch, curves in payloads:
+        uvedge = DetachedUVEdge(*uvedge)
+        sticker = Sticker(uvedge, width, index, DetachedUVEdge(*target), thickness_switch, isreversed, curves)
+        result.append(sticker_geometry(sticker, uvedge))
+    return result
+
+
+def place_points(points, rot, origin):
+    """Rotate and translate an array of points at once, keeping the (0.5, 0.5) contour separators"""
+    placed = points @ np.array(rot).T + tuple(origin)
+    placed[points[:, 0] == 0.5] = 0.5
+    return placed
+
+
 class AbstractStickerConstructor:
-    __slots__ = ('bounds', 'center', 'rot', 'text', 'width', 'vertices', "pattern", "geometry", "geometry_co", "offset_left", "offset_right")
-    def __init__(self, uvedge, pattern):
-        first_vertex, second_vertex = (uvedge.va, uvedge.vb) if not uvedge.uvface.flipped else (uvedge.vb, uvedge.va)
-        edge = first_vertex.co - second_vertex.co
-        self.width = edge.length
+    """Tab along an edge of the given length, in edge-local coordinates"""
+    __slots__ = ('bounds', 'center', 'rot', 'text', 'width', 'vertices', "pattern", "points", "handles", "offset_left", "offset_right")
+    def __init__(self, length, pattern):
+        self.width = length
         self.pattern = pattern
         midsection_count = self.get_midsection_count(self.width, self.pattern)
         midsection_width = self.get_midsection_width(midsection_count, self.pattern)
         self.offset_left = (self.width - midsection_width) / 2
         self.offset_right = (self.width - midsection_width) / 2
-        self.geometry, self.geometry_co = self.construct(self.offset_left, midsection_count, self.pattern)
+        self.points = self.construct(self.offset_left, midsection_count, self.pattern)
+        self.handles = np.tile(self.pattern.handles, midsection_count)
+        self.points.flags.writeable = self.handles.flags.writeable = False
 
     def get_midsection_count(self, width, pattern):
         if (isinstance(pattern, PourHolePattern) or isinstance(pattern, PinPattern)):
@@ -630,32 +832,56 @@ class AbstractStickerConstructor:
             return pattern.width * midsection_count
 
     def construct(self, offset_left, midsection_count, pattern):
-        tab_verts = []
-        tab_verts_co = []
-        tab = pattern.getGeometry()
-        for n in range(0, midsection_count):
-            for i in range(len(tab)):
-                if not(tab[i].co.x == 0.5):
-                    vi = UVVertex((tab[i].co) + M.Vector((pattern.width * n + offset_left, 0)))
-                else:
-                    vi = UVVertex((tab[i].co))
-
-                tab_verts.insert(len(tab_verts), vi)
-                tab_verts_co.insert(len(tab_verts), vi.co)
-
-        return tab_verts, tab_verts_co
+        """Repeat the pattern along the edge, returns an array of points where (0.5, 0.5) separates contours"""
+        tile = pattern.points
+        offsets = pattern.width * np.arange(midsection_count) + offset_left
+        points = tile[np.newaxis, :, :] + np.outer(offsets, (1, 0))[:, np.newaxis, :]
+        points[:, tile[:, 0] == 0.5] = 0.5
+        return points.reshape(-1, 2)
 
 class PourHoleSticker(AbstractStickerConstructor):
-    def __init__(self, uvedge):
-        AbstractStickerConstructor.__init__(self, uvedge, PourHolePattern(True))
+    def __init__(self, length):
+        AbstractStickerConstructor.__init__(self, length, shared_pattern(PourHolePattern, True))
 
 class SawtoothSticker(AbstractStickerConstructor):
-    def __init__(self, uvedge, default_width, index, other: UVEdge, thickness_switch, isreversed):
-        AbstractStickerConstructor.__init__(self, uvedge, SawtoothPattern(thickness_switch, isreversed))
+    def __init__(self, length, thickness_switch, isreversed, curves=False):
+        AbstractStickerConstructor.__init__(self, length, shared_pattern(SawtoothPattern, thickness_switch, isreversed, curves))
 
 class PinSticker(AbstractStickerConstructor):
-    def __init__(self, uvedge, default_width, index, other: UVEdge, thickness_switch, isreversed):
-        AbstractStickerConstructor.__init__(self, uvedge, PinPattern(thickness_switch, isreversed))
+    def __init__(self, length, thickness_switch, isreversed, curves=False):
+        AbstractStickerConstructor.__init__(self, length, shared_pattern(PinPattern, thickness_switch, isreversed, curves))
+
+
+class TemplateCache:
+    """Constructed tabs by their constructor, pattern arguments and edge length rounded to the quantum"""
+    __slots__ = ('templates', 'quantum', 'hits', 'misses')
+
+    def __init__(self, quantum=1e-6):
+        self.templates = dict()
+        self.quantum = quantum
+        self.hits = self.misses = 0
+
+    def get(self, constructor, length, *args):
+        steps = round(length / self.quantum)
+        key = constructor, args, steps
+        template = self.templates.get(key)
+        if template is None:
+            self.misses += 1
+            template = self.templates[key] = constructor(steps * self.quantum, *args)
+        else:
+            self.hits += 1
+        return template
+
+    def reset_stats(self):
+        self.hits = self.misses = 0
+
+    def report(self):
+        total = self.hits + self.misses
+        return "Sticker templates: {} hits of {} ({:.0%}), {} cached".format(
+            self.hits, total, self.hits / total if total else 0, len(self.templates))
+
+
+sticker_templates = TemplateCache()
 
 
 class PourHole:
@@ -689,16 +915,9 @@ class PourHole:
         self.rot = M.Matrix(((cos, -sin), (sin, cos)))
 
         self.width = sticker_width
-        sawtooth = PourHoleSticker(uvedge)
-        tab_verts = []
-        tab_verts_co = []
-        for i in range(len(sawtooth.geometry)):
-            if not(sawtooth.geometry_co[i][0] == 0.5):
-                vi = UVVertex((first_vertex.co - self.rot @ sawtooth.geometry_co[i]))
-            else:
-                vi = UVVertex(( sawtooth.geometry_co[i]))
-            tab_verts.insert(len(tab_verts), vi)
-            tab_verts_co.insert(len(tab_verts), vi.co)
+        sawtooth = sticker_templates.get(PourHoleSticker, edge.length)
+        tab_verts = [UVVertex(M.Vector(point)) for point in place_points(sawtooth.points, -np.array(self.rot), first_vertex.co)]
+        tab_verts_co = [vi.co for vi in tab_verts]
 
         #OPTIONAL ADJUSTMENT: +  self.rot @ M.Vector((0, self.width * 0.2))
         self.vertices = []
@@ -723,3 +942,18 @@ class NumberAlone:
         self.text = index
         self.center = (uvedge.va.co + uvedge.vb.co) / 2 - self.rot @ M.Vector((0, self.size * 1.2))
         self.bounds = [self.center]
+
+
+def register():
+    load_tile_library()
+    # parse any tile file missing from the library now, so that exports do not touch the disk for stickers
+    for tile_class in (Tooth, Gap, Hole, Connector, Pin):
+        for thickness_switch in range(3):
+            tile_class(thickness_switch)
+    PourHoleTile()
+
+
+def unregister():
+    tile_geometry.clear()
+    shared_pattern.cache_clear()
+    sticker_templates.templates.clear()
@@ -0,0 +1,121 @@
+import numpy as np
+
+# A single-stroke font in the manner of the Hershey fonts, for engraving labels with one pass of the tool.
+# Each glyph is a space separated list of strokes, each stroke a run of digit pairs (x, y) on a small grid:
+# the baseline is at y = 2, the x-height at y = 6, capitals and ascenders reach y = 8, descenders y = 0.
+glyph_strokes = {
+    " ": "",
+    "0": "123243473818070312 0347",
+    "1": "172822 1232",
+    "2": "07183847460242",
+    "3": "07183847463525 354443321203",
+    "4": "380444 3832",
+    "5": "480805354443321203",
+    "6": "473818070312324344351504",
+    "7": "084812",
+    "8": "183847463515060718 1504031232434435",
+    "9": "463515060718384743321203",
+    "A": "022842 1535",
+    "B": "02083847463505 3544433202",
+    "C": "4738180703123243",
+    "D": "02082846442202",
+    "E": "48080242 0535",
+    "F": "480802 0535",
+    "G": "47381807031232434525",
+    "H": "0802 4842 0545",
+    "I": "1838 2822 1232",
+    "J": "4843321203",
+    "K": "0802 4804 1542",
+    "L": "080242",
+    "M": "0208254842",
+    "N": "02084248",
+    "O": "123243473818070312",
+    "P": "02083847463505",
+    "Q": "123243473818070312 2442",
+    "R": "02083847463505 2542",
+    "S": "473818070615354443321203",
+    "T": "0848 2822",
+    "U": "080312324348",
+    "V": "082248",
+    "W": "0812253248",
+    "X": "0842 4802",
+    "Y": "082548 2522",
+    "Z": "08480242",
+    "a": "4642 4536160503123243",
+    "b": "0802 0312324345361605",
+    "c": "4536160503123243",
+    "d": "4842 4332120305163645",
+    "e": "04444536160503123243",
+    "f": "38281712 0636",
+    "g": "46413010 4536160503123243",
+    "h": "0802 0516364542",
+    "i": "2622 2728",
+    "j": "262110 2728",
+    "k": "0802 3603 1442",
+    "l": "18282332",
+    "m": "0602 05162522 25364542",
+    "n": "0602 0516364542",
+    "o": "163645433212030516",
+    "p": "0600 0516364543321203",
+    "q": "4640 4536160503123243",
+    "r": "0602 05163645",
+    "s": "45361605143443321203",
+    "t": "18132232 0636",
+    "u": "0603123243 4642",
+    "v": "062246",
+    "w": "0612243246",
+    "x": "0642 4602",
+    "y": "0624 462010",
+    "z": "06460242",
+    ".": "2223",
+    ",": "232211",
+    ":": "2223 2526",
+    ";": "232211 2526",
+    "-": "1535",
+    "_": "0242",
+    "+": "0545 2723",
+    "=": "0444 0646",
+    "/": "0248",
+    "(": "38262432",
+    ")": "18262412",
+    "[": "38282232",
+    "]": "18282212",
+    "<": "470543",
+    ">": "074503",
+    "!": "2824 2223",
+    "?": "0718384746352524 2223",
+    "'": "2827",
+    '"': "1817 3837",
+}
+# every measure is relative to the height of capitals
+GRID = 6
+BASELINE = 2
+SPACING = 2 / GRID
+SPACE = 4 / GRID
+
+glyph_cache = dict()
+
+
+def glyph(character):
+    """Strokes of a character as a list of point arrays, and the advance to the next character.
+    Characters without a glyph are drawn as a question mark."""
+    try:
+        return glyph_cache[character]
+    except KeyError:
+        pass
+    code = glyph_strokes.get(character, glyph_strokes["?"])
+    digits = [np.array([int(digit) for digit in stroke], dtype=float).reshape(-1, 2) for stroke in code.split()]
+    if digits:
+        left = min(stroke[:, 0].min() for stroke in digits)
+        right = max(stroke[:, 0].max() for stroke in digits)
+        strokes = [(stroke - (left, BASELINE)) / GRID for stroke in digits]
+        result = strokes, (right - left) / GRID + SPACING
+    else:
+        result = list(), SPACE
+    glyph_cache[character] = result
+    return result
+
+
+def text_width(text):
+    """Width of a text in the height of capitals, without the spacing after the last character"""
+    return sum(glyph(character)[1] for character in text) - (SPACING if text else 0)
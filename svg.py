@@ -1,12 +1,14 @@
 import mathutils as M
+import gzip
 import os.path as os_path
+import numpy as np
 
 if __package__ is None or __package__ == '':
     # uses current directory visibility
-    import stickers
+    import display
 else:
     # uses current package visibility
-    from . import stickers
+    from . import display
 
 from itertools import chain, repeat, product, combinations
 
@@ -19,10 +21,18 @@ class SVG:
         pure_net: if True, do not use image"""
         self.page_size = page_size
         self.pure_net = pure_net
-        self.style = style
+        self.style = display.Style(style)
         self.margin = margin
         self.text_size = 12
         self.angle_epsilon = angle_epsilon
+        self.optimize_order = False  # sort paths for short travel of a cutter
+        self.common_lines = False  # cut lines shared by touching islands once
+        self.parallel = False  # render pages in worker processes
+        self.precision = None  # decimal places of compact relative paths, None writes absolute coordinates
+        self.tolerance = 0  # simplification of compact paths, in meters
+        self.compress = False  # write gzipped .svgz files
+        self.stroke_text = False  # draw labels as single-stroke lettering instead of font text
+        self.layers = ()  # machine layers in the order of output, see display.LAYERS; empty to group by islands
 
     @classmethod
     def encode_image(cls, bpy_image):
@@ -34,36 +44,68 @@ class SVG:
             bpy_image.save()
             return base64.encodebytes(open(filename, "rb").read()).decode('ascii')
 
-    def line_through_sticker(self, seq):
-        lists = list()
-        curr = list()
-        for point in seq:
-            # print(point.co)
-            if(point.co.x == 0.5):
-                lists.append(curr)
-                curr = list()
-                # print("DELIM")
-            else:
-                curr.append(point)
-        lists.append(curr)
+    # SVG path commands by kind of point: move, line, first point of a curve, other points of a curve, close
+    path_templates = np.array(("\nM %.6f %.6f", "L %.6f %.6f", "C %.6f %.6f", "%.6f %.6f", "Z"))
 
-        finalstring = ""
-        for sublist in lists:
-            finalstring +=  "".join(
-                "{0.x:.6f} {0.y:.6f} {1} ".format(1000 * v.co, c) for (v, c) in zip(sublist, chain("m", repeat("l"))))
+    def path_data(self, paths):
+        """Return SVG path data of the given display.Paths, formatted with one operation for all points"""
+        if self.precision is not None:
+            return self.compact_path_data(paths)
+        codes = paths.codes
+        if not len(codes):
+            return ""
+        index = np.arange(len(codes))
+        curve = codes == display.CURVE4
+        # position of each point within its run of curve points; every third point starts a new curve
+        run_starts = np.maximum.accumulate(np.where(curve & ~np.r_[False, curve[:-1]], index, 0))
+        kinds = np.select(
+            (codes == display.MOVETO, codes == display.LINETO, curve & ((index - run_starts) % 3 == 0), curve),
+            (0, 1, 2, 3), 4)
+        drawn = codes != display.CLOSEPOLY
+        points = (paths.points[drawn] * (1, -1) + (0, self.page_size.y)) * 1000
+        template = " ".join(self.path_templates[kinds].tolist())
+        return (template % tuple(points.ravel().tolist())).lstrip()
 
-        return finalstring
+    # relative SVG path commands by kind of point: move, horizontal, vertical and other lines,
+    # first point of a curve, other points of a curve, close, and a line of zero length
+    compact_templates = np.array(("M%s %s", "h%s", "v%s", "l%s %s", "c%s %s", "%s %s", "z", ""))
 
-    def format_vertex(self, vector, pos=M.Vector((0, 0))):
-        """Return a string with both coordinates of the given vertex."""
-        x, y = vector + pos
-        return "{:.6f} {:.6f}".format((x + self.margin) * 1000, (self.page_size.y - y - self.margin) * 1000)
+    def compact_path_data(self, paths):
+        """Return SVG path data with relative commands, rounded to self.precision decimal places"""
+        if self.tolerance > 0:
+            paths = display.simplify(paths, self.tolerance)
+        codes = paths.codes
+        if not len(codes):
+            return ""
+        # work in integer multiples of the precision, so that the relative steps add up exactly
+        scale = 10 ** self.precision
+        points = np.rint((paths.points * (1, -1) + (0, self.page_size.y)) * 1000 * scale).astype(np.int64)
+        index = np.arange(len(codes))
+        curve = codes == display.CURVE4
+        run_starts = np.maximum.accumulate(np.where(curve & ~np.r_[False, curve[:-1]], index, 0))
+        position = np.where(curve, (index - run_starts) % 3, 0)
+        # all three points of a relative curve are relative to the point where the curve starts
+        steps = points - points[np.maximum(index - 1 - position, 0)]
+        line = codes == display.LINETO
+        dx, dy = steps[:, 0] != 0, steps[:, 1] != 0
+        kinds = np.select(
+            (codes == display.MOVETO, line & dx & ~dy, line & ~dx & dy, line & dx & dy,
+             curve & (position == 0), curve, codes == display.CLOSEPOLY),
+            (0, 1, 2, 3, 4, 5, 6), 7)
+        values = np.where((codes == display.MOVETO)[:, np.newaxis], points, steps) / scale
+        numbers = np.char.mod("%.{}f".format(self.precision), values)
+        if self.precision:
+            numbers = np.char.rstrip(np.char.rstrip(numbers, "0"), ".")
+        used = np.column_stack((np.isin(kinds, (0, 1, 3, 4, 5)), np.isin(kinds, (0, 2, 3, 4, 5))))
+        template = " ".join(self.compact_templates[kinds[kinds != 7]].tolist())
+        return template % tuple(numbers[used].tolist())
 
-    def write(self, mesh, filename):
-        """Write data to a file given by its name."""
-        line_through_simple = " L ".join  # used for formatting of SVG path data
-        rows = "\n".join
+    def format_point(self, point):
+        """Return a string with both coordinates of a point given in page coordinates."""
+        return "{:.6f} {:.6f}".format(point[0] * 1000, (self.page_size.y - point[1]) * 1000)
 
+    def style_arguments(self):
+        """Values for the CSS template"""
         dl = ["{:.2f}".format(length * self.style.line_width * 1000) for length in (2, 5, 10)]
         format_style = {
             'SOLID': "none", 'DOT': "{0},{1}".format(*dl), 'DASH': "{1},{2}".format(*dl),
@@ -72,16 +114,6 @@ class SVG:
         def format_color(vec):
             return "#{:02x}{:02x}{:02x}".format(round(vec[0] * 255), round(vec[1] * 255), round(vec[2] * 255))
 
-        def format_matrix(matrix):
-            return " ".join("{:.6f}".format(cell) for column in matrix for cell in column)
-
-        def path_convert(string, relto=os_path.dirname(filename)):
-            assert (os_path)  # check the module was imported
-            string = os_path.relpath(string, relto)
-            if os_path.sep != '/':
-                string = string.replace(os_path.sep, '/')
-            return string
-
         styleargs = {
             name: format_color(getattr(self.style, name)) for name in (
             "outer_color", "outbg_color", "convex_color", "concave_color", "freestyle_color",
@@ -99,156 +131,117 @@ class SVG:
         styleargs.update({
             name: getattr(self.style, name) * self.style.line_width * 1000 for name in
             ("outer_width", "convex_width", "concave_width", "freestyle_width", "outbg_width", "inbg_width")})
-        for num, page in enumerate(mesh.pages):
-            page_filename = "{}_{}.svg".format(filename[:filename.rfind(".svg")], page.name) if len(
-                mesh.pages) > 1 else filename
-            with open(page_filename, 'w') as f:
-                print(self.svg_base.format(width=self.page_size.x * 1000, height=self.page_size.y * 1000), file=f)
-                print(self.css_base.format(**styleargs), file=f)
-                if page.image_path:
-                    print(
-                        self.image_linked_tag.format(
-                            pos="{0:.6f} {0:.6f}".format(self.margin * 1000),
-                            width=(self.page_size.x - 2 * self.margin) * 1000,
-                            height=(self.page_size.y - 2 * self.margin) * 1000,
-                            path=path_convert(page.image_path)),
-                        file=f)
-                if len(page.islands) > 1:
-                    print("<g>", file=f)
+        styleargs["lettering_width"] = self.style.line_width * 1000
+        return styleargs
+
+    def page_document(self, drawing, css, directory):
+        """Return the whole SVG document of a display.PageDrawing as a string
+        css: formatted style element
+        directory: where the document will be saved, linked images are relative to it"""
+
+        def format_matrix(matrix):
+            return " ".join("{:.6f}".format(cell) for column in matrix for cell in column)
+
+        def path_convert(string):
+            string = os_path.relpath(string, directory)
+            if os_path.sep != '/':
+                string = string.replace(os_path.sep, '/')
+            return string
 
-                for island in page.islands:
-                    print("<g>", file=f)
-                    if island.image_path:
-                        print(
-                            self.image_linked_tag.format(
-                                pos=self.format_vertex(island.pos + M.Vector((0, island.bounding_box.y))),
-                                width=island.bounding_box.x * 1000,
-                                height=island.bounding_box.y * 1000,
-                                path=path_convert(island.image_path)),
-                            file=f)
-                    elif island.embedded_image:
-                        print(
-                            self.image_embedded_tag.format(
-                                pos=self.format_vertex(island.pos + M.Vector((0, island.bounding_box.y))),
-                                width=island.bounding_box.x * 1000,
-                                height=island.bounding_box.y * 1000,
-                                path=island.image_path),
-                            island.embedded_image, "'/>",
-                            file=f, sep="")
-                    if island.title:
-                        print(
-                            self.text_tag.format(
-                                size=1000 * self.text_size,
-                                x=1000 * (island.bounding_box.x * 0.5 + island.pos.x + self.margin),
-                                y=1000 * (self.page_size.y - island.pos.y - self.margin - 0.2 * self.text_size),
-                                label=island.title),
-                            file=f)
+        def image_tag(image):
+            pos = self.format_point(image.pos + (0, image.size[1]))
+            width, height = image.size * 1000
+            if image.path:
+                return self.image_linked_tag.format(pos=pos, width=width, height=height, path=path_convert(image.path))
+            return "".join((self.image_embedded_tag.format(pos=pos, width=width, height=height), image.data, "'/>"))
 
-                    data_markers, data_stickerfill, data_outer, data_convex, data_concave, data_freestyle = (list() for
-                                                                                                             i in
-                                                                                                             range(6))
-                    for marker in island.markers:
-                        if isinstance(marker, stickers.Sticker):
-                            data_stickerfill.append("M {} Z".format(
-                                self.line_through_sticker(self.format_vertex(vertex.co, island.pos)  for vertex in marker.vertices)))
-                            if marker.text:
-                                data_markers.append(self.text_transformed_tag.format(
-                                    label=marker.text,
-                                    pos=self.format_vertex(marker.center, island.pos),
-                                    mat=format_matrix(marker.rot),
-                                    size=marker.width * 1000))
-                        elif isinstance(marker, stickers.PourHole):
-                            data_stickerfill.append("M {} Z".format(
-                                self.line_through_sticker(self.format_vertex(vertex.co, island.pos)  for vertex in marker.vertices)))
-                            if marker.text:
-                                data_markers.append(self.text_transformed_tag.format(
-                                    label=marker.text,
-                                    pos=self.format_vertex(marker.center, island.pos),
-                                    mat=format_matrix(marker.rot),
-                                    size=marker.width * 1000))
-                        elif isinstance(marker, Arrow):
-                            size = marker.size * 1000
-                            position = marker.center + marker.size * marker.rot @ M.Vector((0, -0.9))
-                            data_markers.append(self.arrow_marker_tag.format(
-                                index=marker.text,
-                                arrow_pos=self.format_vertex(marker.center, island.pos),
-                                scale=size,
-                                pos=self.format_vertex(position, island.pos - marker.size * M.Vector((0, 0.4))),
-                                mat=format_matrix(size * marker.rot)))
-                        elif isinstance(marker, stickers.NumberAlone):
-                            data_markers.append(self.text_transformed_tag.format(
-                                label=marker.text,
-                                pos=self.format_vertex(marker.center, island.pos),
-                                mat=format_matrix(marker.rot),
-                                size=marker.size * 1000))
-                    if data_stickerfill and self.style.sticker_fill[3] > 0:
-                        print("<path class='sticker' d='", rows(data_stickerfill), "'/>", file=f)
+        def path_tag(name, paths):
+            return "<path class='{}' d='{}'/>".format(name, self.path_data(paths))
 
-                    outer_edges = set(island.boundary)
-                    while outer_edges:
-                        data_loop = list()
-                        uvedge = outer_edges.pop()
-                        while 1:
-                            if uvedge.sticker:
-                                data_loop.extend(
-                                    self.format_vertex(vertex.co, island.pos) for vertex in uvedge.sticker.vertices[1:])
-                            elif uvedge.pourhole:
-                                data_loop.extend(
-                                    self.format_vertex(vertex.co, island.pos) for vertex in uvedge.pourhole.vertices[1:])
-                            else:
-                                vertex = uvedge.vb if uvedge.uvface.flipped else uvedge.va
-                                data_loop.append(self.format_vertex(vertex.co, island.pos))
-                            uvedge = uvedge.neighbor_right
-                            try:
-                                outer_edges.remove(uvedge)
-                            except KeyError:
-                                break
-                        data_outer.append("M {} Z".format(line_through_simple(data_loop)))
+        def island_elements(island):
+            """SVG elements of an island by their class, in the order of drawing"""
+            elements = dict()
+            if island.sticker_fill and self.style.sticker_fill[3] > 0:
+                elements["sticker"] = [path_tag("sticker", island.sticker_fill)]
+            if island.freestyle:
+                elements["freestyle"] = [path_tag("freestyle", island.freestyle)]
+            if (island.convex or island.concave) and not self.pure_net and self.style.use_inbg:
+                elements["inner_background"] = [path_tag("inner_background", island.convex + island.concave)]
+            if island.convex:
+                elements["convex"] = [path_tag("convex", island.convex)]
+            if island.concave:
+                elements["concave"] = [path_tag("concave", island.concave)]
+            if island.outer:
+                data_outer = self.path_data(island.outer)
+                if not self.pure_net and self.style.use_outbg:
+                    elements["outer_background"] = ["<path class='outer_background' d='{}'/>".format(data_outer)]
+                elements["outer"] = ["<path class='outer' d='{}'/>".format(data_outer)]
+            if island.lettering:
+                elements["lettering"] = [path_tag("lettering", island.lettering)]
+            if island.texts:
+                positions = (island.texts.positions * (1, -1) + (0, self.page_size.y)) * 1000
+                elements["text"] = [self.text_transformed_tag.format(
+                    label=label,
+                    pos="{:.6f} {:.6f}".format(*position),
+                    mat=format_matrix(matrix),
+                    size=size * 1000) for label, position, matrix, size in zip(
+                        island.texts.labels, positions.tolist(), island.texts.matrices, island.texts.sizes.tolist())]
+            return elements
 
-                    visited_edges = set()
-                    for loop, uvedge in island.edges.items():
-                        edge = mesh.edges[loop.edge]
-                        if edge.is_cut(uvedge.uvface.face) and not (uvedge.sticker or uvedge.pourhole):
-                            continue
-                        data_uvedge = "M {}".format(
-                            line_through_simple(
-                                self.format_vertex(vertex.co, island.pos) for vertex in (uvedge.va, uvedge.vb)))
-                        if edge.freestyle:
-                            data_freestyle.append(data_uvedge)
-                        # each uvedge is in two opposite-oriented variants; we want to add each only once
-                        vertex_pair = frozenset((uvedge.va, uvedge.vb))
-                        if vertex_pair not in visited_edges:
-                            visited_edges.add(vertex_pair)
-                            if edge.angle > self.angle_epsilon:
-                                # if(edge.is_kerf):
-                                data_convex.append(data_uvedge)
-                            # elif edge.angle < -self.angle_epsilon:
-                            else:
-                                data_concave.append(data_uvedge)
-                                # if(edge.is_kerf):
-                                #     print("ADDED))))))))))))))))))))))")
-                    if island.is_inside_out:
-                        data_convex, data_concave = data_concave, data_convex
+        out = [self.svg_base.format(width=self.page_size.x * 1000, height=self.page_size.y * 1000), css]
+        if drawing.image:
+            out.append(image_tag(drawing.image))
+        islands = [(island, island_elements(island)) for island in drawing.islands]
 
-                    if data_freestyle:
-                        print("<path class='freestyle' d='", rows(data_freestyle), "'/>", file=f)
-                    if (data_convex or data_concave) and not self.pure_net and self.style.use_inbg:
-                        print("<path class='inner_background' d='", rows(data_convex + data_concave), "'/>", file=f)
-                    if data_convex:
-                        print("<path class='convex' d='", rows(data_convex), "'/>", file=f)
-                    if data_concave:
-                        print("<path class='concave' d='", rows(data_concave), "'/>", file=f)
-                    if data_outer:
-                        if not self.pure_net and self.style.use_outbg:
-                            print("<path class='outer_background' d='", rows(data_outer), "'/>", file=f)
-                        print("<path class='outer' d='", rows(data_outer), "'/>", file=f)
-                    if data_markers:
-                        print(rows(data_markers), file=f)
-                    print("</g>", file=f)
+        if self.layers:
+            # images are not for the machine, they stay below all layers
+            out.extend(image_tag(island.image) for island, elements in islands if island.image)
+            for identifier, label, classes in self.layers:
+                out.append(self.layer_tag.format(id=identifier.lower(), label=label))
+                for island, elements in islands:
+                    out.extend(chain.from_iterable(elements.get(name, ()) for name in classes))
+                out.append("</g>")
+        else:
+            if len(islands) > 1:
+                out.append("<g>")
+            for island, elements in islands:
+                out.append("<g>")
+                if island.image:
+                    out.append(image_tag(island.image))
+                out.extend(chain.from_iterable(elements.values()))
+                out.append("</g>")
+            if len(islands) > 1:
+                out.append("</g>")
+        out.append("</svg>\n")
+        return "\n".join(out)
 
-                if len(page.islands) > 1:
-                    print("</g>", file=f)
-                print("</svg>", file=f)
+    def write_page(self, drawing, css, directory, filename):
+        document = self.page_document(drawing, css, directory)
+        if self.compress:
+            # the compressor consumes the document in chunks as it is written
+            with gzip.open(filename, 'wt', encoding='utf-8') as f:
+                f.write(document)
+        else:
+            with open(filename, 'w') as f:
+                f.write(document)
+
+    def write(self, mesh, filename):
+        """Write data to a file given by its name."""
+        css = self.css_base.format(**self.style_arguments())
+        directory = os_path.dirname(filename)
+        if self.compress and filename.endswith(".svg"):
+            filename += "z"
+        extension = filename[filename.rfind(".svg"):]
+        jobs = list()
+        for page in mesh.pages:
+            page_filename = "{}_{}{}".format(filename[:filename.rfind(".svg")], page.name, extension) if len(
+                mesh.pages) > 1 else filename
+            drawing = display.draw_page(
+                page, self.page_size, self.margin, self.angle_epsilon, self.text_size, self.optimize_order,
+                self.common_lines, self.stroke_text)
+            jobs.append((drawing, css, directory, page_filename))
+        # each page is a separate file, so workers write them directly
+        display.render_pages(self, "write_page", jobs, self.parallel)
 
     image_linked_tag = "<image transform='translate({pos})' width='{width:.6f}' height='{height:.6f}' xlink:href='{path}'/>"
     image_embedded_tag = "<image transform='translate({pos})' width='{width:.6f}' height='{height:.6f}' xlink:href='data:image/png;base64,"
@@ -257,8 +250,11 @@ class SVG:
     arrow_marker_tag = "<g><path transform='matrix({mat} {arrow_pos})' class='arrow' d='M 0 0 L 1 1 L 0 0.25 L -1 1 Z'/>" \
                        "<text transform='translate({pos})' style='font-size:{scale:.2f}'><tspan>{index}</tspan></text></g>"
 
+    layer_tag = "<g inkscape:groupmode='layer' inkscape:label='{label}' id='layer_{id}'>"
+
     svg_base = """<?xml version='1.0' encoding='UTF-8' standalone='no'?>
-    <svg xmlns='http://www.w3.org/2000/svg' xmlns:xlink='http://www.w3.org/1999/xlink' version='1.1'
+    <svg xmlns='http://www.w3.org/2000/svg' xmlns:xlink='http://www.w3.org/1999/xlink'
+    xmlns:inkscape='http://www.inkscape.org/namespaces/inkscape' version='1.1'
     width='{width:.2f}mm' height='{height:.2f}mm' viewBox='0 0 {width:.2f} {height:.2f}'>"""
 
     css_base = """<style type="text/css">
@@ -311,6 +307,13 @@ class SVG:
         stroke: none;
         fill-opacity: {sticker_alpha:.2};
     }}
+    path.lettering {{
+        stroke: {text_color};
+        stroke-linecap: round;
+        stroke-linejoin: round;
+        stroke-width: {lettering_width:.2};
+        stroke-opacity: {text_alpha:.2};
+    }}
     path.arrow {{
         fill: {text_color};
     }}
@@ -0,0 +1,107 @@
+import json
+import os
+import struct
+import numpy as np
+
+# A compiled tile library is a single file:
+#   magic, length of the header, JSON header, padding to 8 bytes, float64 rows (x, y, is_handle) of all tiles.
+# The header maps each SVG file name to its first row and number of rows in the point array.
+# Points are stored exactly as Stickers.svg2points returns them, including the (0.5, 0.5) contour separators
+# and the control points of Bezier curves, which have is_handle set to 1.
+
+MAGIC = b"FMTILES2"
+LIBRARY_NAME = "tiles.bin"
+
+
+def library_path(directory):
+    return os.path.join(directory, LIBRARY_NAME)
+
+
+def tile_names(directory):
+    return sorted(name for name in os.listdir(directory) if name.lower().endswith(".svg"))
+
+
+def is_current(directory, path):
+    """Check that the library exists and is newer than every tile SVG in the directory"""
+    try:
+        library_time = os.path.getmtime(path)
+    except OSError:
+        return False
+    # adding or removing a file changes the directory, even if the file itself is old
+    if os.path.getmtime(directory) > library_time:
+        return False
+    return all(os.path.getmtime(os.path.join(directory, name)) <= library_time for name in tile_names(directory))
+
+
+def compile_library(directory, parse, path=None):
+    """Parse every tile SVG in the directory and write them into one library file
+    parse: function taking a file path and returning a list of (x, y, is_handle) rows, or None on failure
+    returns the name of the written file"""
+    path = path or library_path(directory)
+    files = dict()
+    arrays = list()
+    row = 0
+    for name in tile_names(directory):
+        try:
+            points = parse(os.path.join(directory, name))
+        except Exception as exc:
+            print("Skipping sticker tile {}: {}".format(name, exc))
+            continue
+        if points is None:
+            continue
+        array = np.array(points, dtype='<f8').reshape(-1, 3)
+        files[name] = (row, len(array))
+        arrays.append(array)
+        row += len(array)
+    header = json.dumps({"files": files, "rows": row}).encode()
+    padding = -(len(MAGIC) + 4 + len(header)) % 8
+    # write next to the target and rename, so that a concurrent reader never sees half a file
+    temporary = path + ".tmp"
+    with open(temporary, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        f.write(b" " * padding)
+        for array in arrays:
+            f.write(array.tobytes())
+    os.replace(temporary, path)
+    # the rename has just changed the directory, which must not make the library look outdated
+    os.utime(path)
+    return path
+
+
+def read_library(path):
+    """Map a compiled library into memory, returns {file name: read-only array of rows (x, y, is_handle)}"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a sticker tile library: {}".format(path))
+        header_length, = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_length).decode())
+    offset = len(MAGIC) + 4 + header_length
+    offset += -offset % 8
+    if not header["rows"]:
+        return {name: np.zeros((0, 3)) for name in header["files"]}
+    points = np.memmap(path, dtype='<f8', mode='r', offset=offset, shape=(header["rows"], 3))
+    return {name: points[start:start + count] for name, (start, count) in header["files"].items()}
+
+
+def load_library(directory, parse):
+    """Return the rows of all tile SVGs in the directory, recompiling the library when a source is newer.
+    Returns an empty dict if the library cannot be written (e.g., a read-only installation)."""
+    path = library_path(directory)
+    if is_current(directory, path):
+        try:
+            return read_library(path)
+        except (OSError, ValueError, KeyError):
+            # written by another version or damaged, compile it again
+            pass
+    try:
+        compile_library(directory, parse, path)
+    except OSError as exc:
+        print("Cannot write the sticker tile library:", exc)
+        return dict()
+    try:
+        return read_library(path)
+    except (OSError, ValueError, KeyError) as exc:
+        print("Cannot read the sticker tile library:", exc)
+        return dict()
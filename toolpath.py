@@ -0,0 +1,104 @@
+import mathutils as M
+
+if __package__ is None or __package__ == '':
+    # uses current directory visibility
+    import display
+else:
+    # uses current package visibility
+    from . import display
+
+
+class GCode:
+    """G-code toolpath for drag knife cutters, one file per page"""
+
+    # every command is followed by a new line; {depth} in the pen down command is the depth of the layer in mm
+    pen_up = "G0 Z5"
+    pen_down = "G1 Z-{depth:.3f} F300"
+    header = "G21\nG90\n"
+    footer = "M2\n"
+    layer_tag = "(layer {label})\n"
+    travel_tag = "G0 X%.3f Y%.3f\n"
+    line_tag = "G1 X%.3f Y%.3f\n"
+    units = 1000  # per meter
+    buffer_size = 1 << 16
+
+    def __init__(self, page_size: M.Vector, style, margin, pure_net=True, angle_epsilon=0):
+        self.page_size = page_size
+        self.style = display.Style(style)
+        self.margin = margin
+        self.pure_net = pure_net
+        self.angle_epsilon = angle_epsilon
+        self.common_lines = False  # cut lines shared by touching islands once
+        self.parallel = False  # render pages in worker processes
+        self.stroke_text = True  # font text cannot be cut, so labels are drawn as single-stroke lettering
+        self.layers = ()  # machine layers in the order of cutting, see display.LAYERS; empty for the default order
+        self.curve_steps = 8  # straight moves per Bezier curve
+        self.cut_depth = 0.0003  # in meters
+        self.score_depth = 0.0001
+
+    @classmethod
+    def encode_image(cls, bpy_image):
+        """A toolpath carries no raster images, so textures are left out"""
+        return None
+
+    def subpath_moves(self, paths, pen_down):
+        """Generate the commands that cut each subpath of the given display.Paths"""
+        for points, codes in display.split_paths(display.flatten(paths, self.curve_steps)):
+            # the point of a closing code repeats the start, so the knife returns there
+            points = self.units * points
+            yield self.travel_tag % tuple(points[0].tolist())
+            yield pen_down
+            yield self.line_tag * (len(points) - 1) % tuple(points[1:].ravel().tolist())
+            yield self.pen_up + "\n"
+
+    def page_toolpath(self, drawing):
+        """Generate the commands of a display.PageDrawing, layer by layer"""
+        # folds are scored before the outline sets the island loose
+        layers = self.layers or display.layer_order({'ENGRAVE': 1, 'SCORE': 2, 'CUT': 3})
+        yield self.header
+        yield self.pen_up + "\n"
+        for tool, (identifier, label, classes) in enumerate(layers, 1):
+            depth = self.cut_depth if identifier == 'CUT' else self.score_depth
+            pen_down = self.pen_down.format(depth=1000 * depth) + "\n"
+            yield self.layer_tag.format(label=label, tool=tool)
+            for island in drawing.islands:
+                for name in classes:
+                    # font text cannot be cut, only single-stroke lettering
+                    paths = getattr(island, name) if name != "text" else None
+                    if paths:
+                        yield from self.subpath_moves(paths, pen_down)
+        yield self.footer
+
+    def write_page(self, drawing, filename):
+        """Stream the toolpath of a display.PageDrawing into a file"""
+        with open(filename, 'w', buffering=self.buffer_size) as f:
+            f.writelines(self.page_toolpath(drawing))
+
+    def write(self, mesh, filename):
+        """Write data to a file given by its name, one file per page"""
+        extension = filename[filename.rfind("."):]
+        jobs = list()
+        for page in mesh.pages:
+            page_filename = "{}_{}{}".format(filename[:filename.rfind(".")], page.name, extension) if len(
+                mesh.pages) > 1 else filename
+            # a toolpath is always ordered for short travel of the knife
+            drawing = display.draw_page(
+                page, self.page_size, self.margin, self.angle_epsilon, self.text_size, True, self.common_lines,
+                self.stroke_text)
+            jobs.append((drawing, page_filename))
+        display.render_pages(self, "write_page", jobs, self.parallel)
+
+
+class HPGL(GCode):
+    """HPGL toolpath for cutting plotters, one file per page
+    each layer selects a tool of its own, numbered in the order of layers,
+    so that the cutter can score with less force"""
+
+    pen_up = "PU;"
+    pen_down = "PD;"
+    header = "IN;PA;\n"
+    footer = "SP0;\n"
+    layer_tag = "SP{tool};\n"
+    travel_tag = "PA%.0f,%.0f;\n"
+    line_tag = "PA%.0f,%.0f;\n"
+    units = 40000  # plotter units per meter
@@ -1,17 +1,28 @@
 import bpy
 import bmesh
+import json
+import os.path
 import mathutils as M
 
 if __package__ is None or __package__ == '':
     # uses current directory visibility
     import mesh
+    import display
     import svg
     import pdf
+    import dxf
+    import toolpath
 else:
     # uses current package visibility
     from . import mesh
+    from . import display
     from . import svg
     from . import pdf
+    from . import dxf
+    from . import toolpath
+
+exporters = {
+    'SVG': svg.SVG, 'PDF': pdf.PDF, 'DXF': dxf.DXF, 'GCODE': toolpath.GCode, 'HPGL': toolpath.HPGL}
 
 default_priority_effect = {
     'CONVEX': 0.5,
@@ -84,12 +95,28 @@ class Unfolder:
             self.mesh.setThicknessSwitch(0)
 
 
+    def finalize(self, properties, printable_size, name=''):
+        """Scale the islands to paper, add stickers and fit each island into its bounding box"""
+        unit_scale = bpy.context.scene.unit_settings.scale_length
+        # after this call, all dimensions will be in meters
+        self.mesh.scale_islands(unit_scale / properties.scale)
+        print(name)
+        if properties.do_create_stickers and name == '':
+            self.mesh.generate_stickers(properties.sticker_width, properties.do_create_numbers,
+                                        properties.do_parallel_stickers, properties.do_keep_curves)
+        # elif properties.do_create_numbers:
+        #     self.mesh.generate_numbers_alone(properties.sticker_width)
+        #
+        text_height = properties.sticker_width if (properties.do_create_numbers and len(self.mesh.islands) > 1) else 0
+        # title height must be somewhat larger that text size, glyphs go below the baseline
+        self.mesh.finalize_islands(printable_size, title_height=text_height * 1.2)
+
     def save(self, properties, name = ''):
         """Export the document"""
         # Note about scale: input is directly in blender length
         # Mesh.scale_islands multiplies everything by a user-defined ratio
         # exporters (SVG or PDF) multiply everything by 1000 (output in millimeters)
-        Exporter = svg.SVG if properties.file_format == 'SVG' else pdf.PDF
+        Exporter = exporters[properties.file_format]
         filepath = properties.filepath
         extension = properties.file_format.lower()
         filepath = bpy.path.ensure_ext(filepath+name, "." + extension)
@@ -97,23 +124,13 @@ class Unfolder:
         page_size = M.Vector((properties.output_size_x, properties.output_size_y))
         # printable area size in meters
         printable_size = page_size - 2 * properties.output_margin * M.Vector((1, 1))
-        unit_scale = bpy.context.scene.unit_settings.scale_length
         ppm = properties.output_dpi * 100 / 2.54  # pixels per meter
 
-        # after this call, all dimensions will be in meters
-        self.mesh.scale_islands(unit_scale / properties.scale)
-        print(name)
-        if properties.do_create_stickers and name == '':
-            self.mesh.generate_stickers(properties.sticker_width, properties.do_create_numbers)
-        # elif properties.do_create_numbers:
-        #     self.mesh.generate_numbers_alone(properties.sticker_width)
-        #
-        text_height = properties.sticker_width if (properties.do_create_numbers and len(self.mesh.islands) > 1) else 0
-        # title height must be somewhat larger that text size, glyphs go below the baseline
-        self.mesh.finalize_islands(printable_size, title_height=text_height * 1.2)
-        self.mesh.fit_islands(printable_size)
+        self.finalize(properties, printable_size, name)
+        fit_islands(self.mesh, properties, printable_size, filepath)
 
-        if properties.output_type != 'NONE':
+        # DXF and toolpaths hold lines only, there is no texture to bake for them
+        if properties.output_type != 'NONE' and properties.file_format in ('PDF', 'SVG'):
             # bake an image and save it as a PNG to disk or into memory
             image_packing = properties.image_packing if properties.file_format == 'SVG' else 'ISLAND_EMBED'
             use_separate_images = image_packing in ('ISLAND_LINK', 'ISLAND_EMBED')
@@ -159,8 +176,105 @@ class Unfolder:
         exporter = Exporter(page_size, properties.style, properties.output_margin, (properties.output_type == 'NONE'),
                             properties.angle_epsilon)
         # exporter.do_create_stickers = properties.do_create_stickers
-        exporter.text_size = properties.sticker_width
+        configure_exporter(exporter, properties)
+        exporter.write(self.mesh, filepath)
+
+
+class UnfolderGroup:
+    """Several Unfolders whose nets share the sheets of one document"""
+
+    def __init__(self, unfolders):
+        self.unfolders = unfolders
+        self.mesh = None
+
+    def save(self, properties, sheet_size, name=''):
+        """Export the islands of all Unfolders onto sheets of the given size (in meters)"""
+        Exporter = exporters[properties.file_format]
+        filepath = bpy.path.ensure_ext(properties.filepath + name, "." + properties.file_format.lower())
+        printable_size = sheet_size - 2 * properties.output_margin * M.Vector((1, 1))
+        for unfolder in self.unfolders:
+            unfolder.finalize(properties, printable_size, name)
+        self.mesh = mesh.MeshGroup([unfolder.mesh for unfolder in self.unfolders])
+        fit_islands(self.mesh, properties, printable_size, filepath)
+        # textures are baked per object, so the shared document contains the net only
+        exporter = Exporter(sheet_size, properties.style, properties.output_margin, True, properties.angle_epsilon)
+        configure_exporter(exporter, properties)
         exporter.write(self.mesh, filepath)
 
 
+def configure_exporter(exporter, properties):
+    """Pass the output options of the operator to any of the exporters"""
+    exporter.text_size = properties.sticker_width
+    exporter.optimize_order = properties.do_optimize_order
+    exporter.common_lines = properties.do_common_lines
+    exporter.parallel = properties.do_parallel_pages
+    if properties.file_format not in ('GCODE', 'HPGL'):
+        # toolpaths always draw labels as single-stroke lettering
+        exporter.stroke_text = properties.do_stroke_text
+    if properties.do_layered_output:
+        exporter.layers = display.layer_order({
+            'CUT': properties.cut_layer_position, 'SCORE': properties.score_layer_position,
+            'ENGRAVE': properties.engrave_layer_position})
+    if properties.file_format == 'SVG':
+        exporter.compress = properties.do_svgz
+        if properties.do_compact_svg:
+            exporter.precision = properties.svg_precision
+            exporter.tolerance = properties.simplify_tolerance
+    elif properties.file_format == 'PDF':
+        exporter.object_streams = properties.do_object_streams
+    elif properties.file_format in ('GCODE', 'HPGL'):
+        if properties.pen_up_command:
+            exporter.pen_up = properties.pen_up_command
+        if properties.pen_down_command:
+            try:
+                properties.pen_down_command.format(depth=0.0)
+            except (KeyError, IndexError, AttributeError, TypeError, ValueError) as error:
+                raise UnfoldError(
+                    "The pen down command must contain no other fields than {{depth}} ({}).".format(error))
+            exporter.pen_down = properties.pen_down_command
+        exporter.cut_depth = properties.cut_depth
+        exporter.score_depth = properties.score_depth
+
+
+def fit_islands(layout, properties, printable_size, filepath=None):
+    """Arrange the islands of a Mesh or MeshGroup onto pages by the selected packing method
+    if a layout of the same document was saved before, islands that did not change keep their place"""
+    settings = [round(printable_size.x, 6), round(printable_size.y, 6), properties.packing_method]
+    if properties.packing_method == 'NESTING':
+        settings += [properties.nesting_gap, properties.nesting_resolution, properties.nesting_rotations]
+    record_path = layout_path(filepath) if filepath and properties.do_keep_layout else None
+    hashes = [island.geometry_hash() for island in layout.islands]
+    islands = layout.islands
+    record = load_layout(record_path, settings) if record_path else None
+    if record:
+        islands = layout.restore_layout(record, hashes)
+    if islands:
+        if properties.packing_method == 'NESTING':
+            layout.nest_islands(printable_size, properties.nesting_gap, properties.nesting_resolution,
+                                int(properties.nesting_rotations), properties.packing_time_limit, islands)
+        else:
+            layout.fit_islands(printable_size, properties.packing_time_limit, islands)
+    if record_path:
+        save_layout(record_path, settings, layout.record_layout(hashes))
+
+
+def layout_path(filepath):
+    """Path of the file that remembers the page layout of an exported document"""
+    return os.path.splitext(filepath)[0] + ".layout.json"
+
+
+def load_layout(path, settings):
+    """Read the pages of a saved layout, or None if there is none made with the same settings"""
+    try:
+        with open(path) as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(record, dict) or record.get("settings") != settings:
+        return None
+    return record.get("pages")
+
 
+def save_layout(path, settings, pages):
+    with open(path, 'w') as f:
+        json.dump({"settings": settings, "pages": pages}, f)